@@ -1,8 +1,9 @@
 from __future__ import annotations
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime, timedelta
+import threading
+import time
 import uuid
-import pandas as pd
-from langgraph.graph import StateGraph
 import sys
 from pathlib import Path
 
@@ -11,17 +12,44 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 try:
     from utils.io_utils import (
-        load_patients, load_schedule, save_schedule, append_appointment_export,
-        simulate_send_email, simulate_send_sms, INTAKE_FORM
+        reserve_slot, cancel_slot, move_slot, append_appointment_export,
+        INTAKE_FORM, StorageBusyError
     )
+    from utils.patient_index import get_patient_registry
+    from utils.message_parser import parse_message
+    from utils.notifications import Notification, get_dispatcher
+    from utils.reminders import get_reminder_scheduler
+    from utils.tracing import traced_node
+    from utils.slot_store import get_slot_store, note_schedule_written, schedule_write
+    from utils.records import Appointment
+    from utils.doctor_resolver import get_doctor_resolver
+    from utils.lazy import load_deferred
+    from utils.allocation import get_allocator
 except ImportError:
     from src.utils.io_utils import (
-        load_patients, load_schedule, save_schedule, append_appointment_export,
-        simulate_send_email, simulate_send_sms, INTAKE_FORM
+        reserve_slot, cancel_slot, move_slot, append_appointment_export,
+        INTAKE_FORM, StorageBusyError
     )
+    from src.utils.patient_index import get_patient_registry
+    from src.utils.message_parser import parse_message
+    from src.utils.notifications import Notification, get_dispatcher
+    from src.utils.reminders import get_reminder_scheduler
+    from src.utils.tracing import traced_node
+    from src.utils.slot_store import get_slot_store, note_schedule_written, schedule_write
+    from src.utils.records import Appointment
+    from src.utils.doctor_resolver import get_doctor_resolver
+    from src.utils.lazy import load_deferred
+    from src.utils.allocation import get_allocator
 
 State = Dict[str, Any]
 
+# Reminder offsets before the appointment start, with the message sent at each
+REMINDERS = [
+    (timedelta(hours=72), "Reminder 1: Your appointment with {doctor_name} is on {date} at {start_time}"),
+    (timedelta(hours=24), "Reminder 2: Please confirm attendance and complete the intake form."),
+    (timedelta(hours=2), "Reminder 3: Final reminder. Reply CANCEL to reschedule."),
+]
+
 
 def _ensure_messages(state: State) -> None:
     if 'messages' not in state or not isinstance(state['messages'], list):
@@ -40,30 +68,13 @@ def _add_ai(state: State, text: str) -> None:
 
 def greeting_agent(state: State, user_input: str) -> State:
     _add_user(state, user_input)
-    lower = user_input.lower()
-    
-    # Extract simple key:value pairs
-    def extract(key: str, target: str) -> None:
-        if state.get(target):
-            return
-        if key in lower:
-            try:
-                # Find the key and extract the value after the colon
-                key_index = lower.find(key)
-                if key_index != -1:
-                    # Find the colon after the key
-                    colon_index = user_input.find(':', key_index)
-                    if colon_index != -1:
-                        # Extract value after colon, stop at next comma or end
-                        value = user_input[colon_index + 1:].strip()
-                        if ',' in value:
-                            value = value.split(',')[0].strip()
-                        state[target] = value
-            except Exception:
-                pass
-
-    for key, target in [('name:', 'name'), ('dob:', 'dob'), ('dr:', 'doctor'), ('location:', 'location')]:
-        extract(key, target)
+    # Extract simple key:value pairs, skipping fields we already have
+    targets = [t for t in ('name', 'dob', 'doctor', 'location') if not state.get(t)]
+    if targets:
+        fields = parse_message(user_input)
+        for target in targets:
+            if fields.get(target):
+                state[target] = fields[target]
 
     missing = []
     if not state.get('name'):
@@ -82,85 +93,90 @@ def greeting_agent(state: State, user_input: str) -> State:
     return state
 
 
+def _name_parts(name: str) -> Tuple[str, str]:
+    tokens = name.strip().split()
+    return tokens[0], tokens[-1] if len(tokens) > 1 else ''
+
+
 def patient_lookup_agent(state: State) -> State:
-    df = load_patients()
+    registry = get_patient_registry()
     is_returning = False
     name = state.get('name')
     dob = state.get('dob')
     if name and dob:
-        tokens = name.strip().split()
-        first = tokens[0]
-        last = tokens[-1] if len(tokens) > 1 else ''
-        matches = df[(df['first_name'].str.lower() == first.lower()) &
-                     (df['last_name'].str.lower() == last.lower()) &
-                     (df['dob'].astype(str) == str(dob))]
-        is_returning = len(matches) > 0
+        first, last = _name_parts(name)
+        patient_id = registry.lookup(first, last, dob)
+        is_returning = patient_id is not None
+        if is_returning:
+            state['patient_id'] = patient_id
     state['is_new_patient'] = not is_returning
     _add_ai(state, ("You're a returning patient. Let's find a time." if is_returning else "Welcome! We'll register you as a new patient."))
     return state
 
 
+def _patient_id(state: State) -> str:
+    return state.get('patient_id') or state.get('name') or 'NEW'
+
+
 def scheduling_agent(state: State) -> State:
-    schedule = load_schedule()
-    doctor = state.get('doctor', '')
-    location = state.get('location', '')
-    
-    # More flexible matching
-    if doctor:
-        # Try to match doctor name more flexibly
-        doctor_clean = doctor.replace('Dr.', '').replace('Dr', '').strip().lower()
-        # Try full name match first, then last name
-        if not schedule[schedule['doctor_name'].str.lower().str.contains(doctor_clean, na=False)].empty:
-            schedule = schedule[schedule['doctor_name'].str.lower().str.contains(doctor_clean, na=False)]
-        else:
-            # Try last name only
-            doctor_last = doctor_clean.split()[-1]
-            schedule = schedule[schedule['doctor_name'].str.lower().str.contains(doctor_last, na=False)]
-    
-    if location:
-        # Extract key words from location
-        location_words = location.lower().split()
-        location_match = False
-        for word in location_words:
-            if len(word) > 3:  # Only match meaningful words
-                location_match = schedule['location'].str.lower().str.contains(word, na=False).any()
-                if location_match:
-                    schedule = schedule[schedule['location'].str.lower().str.contains(word, na=False)]
-                    break
-    
+    store = get_slot_store()
+    doctors = get_doctor_resolver().match(state.get('doctor', ''), state.get('location', ''))
+
     if state.get('is_new_patient') is not None:
-        slot_type = 'new' if state['is_new_patient'] else 'returning'
-        schedule = schedule[(schedule['slot_type'] == slot_type) & (schedule['available'] == True)]
-    
-    if schedule.empty:
-        _add_ai(state, "Sorry, no available slots match your criteria. Try another doctor/location or a different day.")
-        return state
+        slot_types = ['new' if state['is_new_patient'] else 'returning']
+    else:
+        slot_types = ['new', 'returning']
 
-    slot = schedule.sort_values(['date','start_time']).iloc[0].to_dict()
+    allocator = get_allocator()
     appointment_id = str(uuid.uuid4())[:8]
-    
-    # Try to save the schedule, but don't fail if file is locked
+    booked = []
+
+    def claim(patient_id: str) -> bool:
+        # Every lost race drops a slot from the local candidates, so this terminates
+        while True:
+            candidate = allocator.choose(store, keys)
+            if candidate is None:
+                return False
+            with schedule_write():
+                if reserve_slot(candidate.doctor_id, candidate.date, candidate.start_time,
+                                appointment_id, patient_id):
+                    store.mark_booked(candidate.doctor_id, candidate.date, candidate.start_time,
+                                      appointment_id, patient_id)
+                    note_schedule_written()
+                    booked.append((candidate, patient_id))
+                    return True
+            # Someone else claimed it first; drop it locally and try the next one
+            store.mark_booked(candidate.doctor_id, candidate.date, candidate.start_time)
+
     try:
-        full = load_schedule()
-        idx = full[(full['doctor_id'] == slot['doctor_id']) & (full['date'] == slot['date']) & (full['start_time'] == slot['start_time'])].index
-        full.loc[idx, 'available'] = False
-        full.loc[idx, 'appointment_id'] = appointment_id
-        full.loc[idx, 'patient_id'] = state.get('name') or 'NEW'
-        save_schedule(full)
-    except PermissionError:
-        # File is locked by another process, but we can still proceed
-        _add_ai(state, "Note: Schedule file is currently in use, but appointment is confirmed.")
-
-    state['scheduled'] = {
-        'appointment_id': appointment_id,
-        'doctor_name': slot['doctor_name'],
-        'location': slot['location'],
-        'date': slot['date'],
-        'start_time': slot['start_time'],
-        'end_time': slot['end_time'],
-        'slot_type': slot['slot_type'],
-    }
-    _add_ai(state, f"Booked {slot['doctor_name']} at {slot['location']} on {slot['date']} at {slot['start_time']}.")
+        store = allocator.prepare(store, doctors, slot_types)
+        keys = store.keys_for(doctors, slot_types)
+        if state.get('is_new_patient') and not state.get('patient_id') and state.get('name') and state.get('dob'):
+            # New patients are registered with their first booking so the next visit finds them,
+            # but only once the slot is theirs so a failed request leaves no record behind
+            first, last = _name_parts(state['name'])
+            state['patient_id'] = get_patient_registry().register(first, last, state['dob'], claim=claim)
+        else:
+            claim(_patient_id(state))
+    except StorageBusyError:
+        _add_ai(state, "Sorry, the schedule is busy right now and your appointment was not booked. Please try again.")
+        return state
+
+    if not booked:
+        # Offer the next openings with any doctor at the same location(s), else anywhere
+        locations = {d['location'] for d in doctors} or None
+        alternatives = store.search(locations=locations, slot_types=slot_types, limit=3) or \
+            store.search(slot_types=slot_types, limit=3)
+        if alternatives:
+            options = "; ".join(f"{s.doctor_name} at {s.location} on {s.date} at {s.start_time}" for s in alternatives)
+            _add_ai(state, f"Sorry, no available slots match your criteria. Next openings: {options}.")
+        else:
+            _add_ai(state, "Sorry, no available slots match your criteria. Try another doctor/location or a different day.")
+        return state
+
+    slot, patient_id = booked[0]
+    state['scheduled'] = Appointment(appointment_id, patient_id, slot).to_dict()
+    _add_ai(state, f"Booked {slot.doctor_name} at {slot.location} on {slot.date} at {slot.start_time}.")
     return state
 
 
@@ -168,13 +184,10 @@ def insurance_agent(state: State, user_input: Optional[str] = None) -> State:
     if 'insurance' not in state or not isinstance(state.get('insurance'), dict):
         state['insurance'] = {}
     if user_input:
-        lower = user_input.lower()
-        if 'carrier' in lower:
-            state['insurance']['carrier'] = user_input.split(':')[-1].strip()
-        if 'member' in lower:
-            state['insurance']['member_id'] = user_input.split(':')[-1].strip()
-        if 'group' in lower:
-            state['insurance']['group_number'] = user_input.split(':')[-1].strip()
+        fields = parse_message(user_input)
+        for key in ('carrier', 'member_id', 'group_number'):
+            if fields.get(key):
+                state['insurance'][key] = fields[key]
     missing = [k for k in ['carrier','member_id','group_number'] if not state['insurance'].get(k)]
     if missing:
         _add_ai(state, f"Please provide insurance {', '.join(missing)} (e.g., Carrier: Star Health; Member: ABC123; Group: 987654).")
@@ -192,7 +205,8 @@ def confirmation_agent(state: State) -> State:
         return state
     name = state.get('name','Patient')
     email = f"{name.replace(' ','.').lower()}@example.com"
-    simulate_send_email(
+    get_dispatcher().submit(Notification(
+        channel='email',
         to=email,
         subject="Appointment Confirmation & Intake Form",
         body=(
@@ -201,7 +215,8 @@ def confirmation_agent(state: State) -> State:
             f"Please complete the attached intake form before your visit.\n\nThank you."
         ),
         attachments=[INTAKE_FORM] if INTAKE_FORM.exists() else None,
-    )
+        key=state['scheduled']['appointment_id'],
+    ))
     append_appointment_export([
         {
             'appointment_id': state['scheduled']['appointment_id'],
@@ -214,11 +229,11 @@ def confirmation_agent(state: State) -> State:
             'insurance_carrier': state.get('insurance', {}).get('carrier',''),
             'member_id': state.get('insurance', {}).get('member_id',''),
             'group_number': state.get('insurance', {}).get('group_number',''),
-            'status': 'confirmed',
+            'status': 'rescheduled' if state.get('rescheduled') else 'confirmed',
         }
     ])
     state.setdefault('confirmations', {})['email_sent'] = True
-    _add_ai(state, "Confirmation email sent with intake form attachment.")
+    _add_ai(state, "Confirmation email with the intake form attachment is on its way.")
     return state
 
 
@@ -226,15 +241,139 @@ def reminder_agent(state: State) -> State:
     if not state.get('scheduled'):
         return state
     phone = '+1-000-000-0000'
-    simulate_send_sms(phone, f"Reminder 1: Your appointment with {state['scheduled']['doctor_name']} is on {state['scheduled']['date']} at {state['scheduled']['start_time']}")
-    simulate_send_sms(phone, "Reminder 2: Please confirm attendance and complete the intake form.")
-    simulate_send_sms(phone, "Reminder 3: Final reminder. Reply CANCEL to reschedule.")
-    state.setdefault('confirmations', {})['reminders_sent'] = 3
-    _add_ai(state, "Three reminders have been scheduled and sent (simulated).")
+    scheduled = state['scheduled']
+    starts_at = datetime.fromisoformat(f"{scheduled['date']} {scheduled['start_time']}")
+    now = time.time()
+    queued = 0
+    for offset, template in REMINDERS:
+        send_at = (starts_at - offset).timestamp()
+        if send_at <= now:
+            # Too close to the appointment for this reminder
+            continue
+        get_reminder_scheduler().schedule(
+            scheduled['appointment_id'], send_at, 'sms', phone, template.format(**scheduled))
+        queued += 1
+    # Kept under the original key that callers and the UI read; these are now queued, not sent yet
+    state.setdefault('confirmations', {})['reminders_sent'] = queued
+    _add_ai(state, f"{queued} SMS reminder(s) scheduled before your appointment.")
+    return state
+
+
+def cancel_agent(state: State) -> State:
+    scheduled = state.get('scheduled')
+    if not scheduled:
+        _add_ai(state, "There is no appointment to cancel.")
+        return state
+    appointment_id = scheduled['appointment_id']
+    store = get_slot_store()
+    try:
+        with schedule_write():
+            old = cancel_slot(appointment_id)
+            if old is not None:
+                store.release(old['doctor_id'], old['date'], old['start_time'])
+                note_schedule_written()
+    except StorageBusyError:
+        _add_ai(state, "Sorry, the schedule is busy right now and your appointment was not cancelled. Please try again.")
+        return state
+    get_reminder_scheduler().cancel(appointment_id)
+    append_appointment_export([{'appointment_id': appointment_id, 'status': 'cancelled'}])
+    state['cancelled'] = state.pop('scheduled')
+    _add_ai(state, f"Your appointment with {scheduled['doctor_name']} on {scheduled['date']} at {scheduled['start_time']} has been cancelled.")
+    return state
+
+
+def reschedule_agent(state: State) -> State:
+    scheduled = state.get('scheduled')
+    state['rescheduled'] = False
+    if not scheduled:
+        _add_ai(state, "There is no appointment to reschedule.")
+        return state
+    store = get_slot_store()
+    doctors = get_doctor_resolver().match(state.get('doctor', ''), state.get('location', ''))
+    filters = dict(
+        doctor_ids=[d['doctor_id'] for d in doctors], locations={d['location'] for d in doctors},
+        slot_types=[scheduled['slot_type']], date_from=state.get('preferred_date'),
+        time_from=state.get('preferred_time'), limit=1,
+    )
+    appointment_id = scheduled['appointment_id']
+    patient_id = _patient_id(state)
+    slot = None
+    try:
+        # Same shape as booking: every lost race drops the candidate locally
+        while True:
+            candidates = store.search(**filters)
+            if not candidates:
+                break
+            candidate = candidates[0]
+            with schedule_write():
+                old = move_slot(appointment_id, candidate.doctor_id, candidate.date, candidate.start_time)
+                if old is not None:
+                    store.release(old['doctor_id'], old['date'], old['start_time'])
+                    store.mark_booked(candidate.doctor_id, candidate.date, candidate.start_time, appointment_id, patient_id)
+                    note_schedule_written()
+            if old is not None:
+                slot = candidate
+                break
+            store.mark_booked(candidate.doctor_id, candidate.date, candidate.start_time)
+    except StorageBusyError:
+        _add_ai(state, "Sorry, the schedule is busy right now and your appointment was not moved. Please try again.")
+        return state
+    except LookupError:
+        _add_ai(state, "That appointment is no longer booked, so there is nothing to reschedule.")
+        return state
+    except ValueError:
+        _add_ai(state, "Please give the new date as YYYY-MM-DD and time as HH:MM.")
+        return state
+
+    if slot is None:
+        _add_ai(state, "Sorry, no other slot matches. Your appointment is unchanged.")
+        return state
+    # Reminders for the old time are dropped; reminder_agent queues new ones
+    get_reminder_scheduler().cancel(appointment_id)
+    state['scheduled'] = Appointment(appointment_id, patient_id, slot).to_dict()
+    state['rescheduled'] = True
+    _add_ai(state, f"Moved your appointment to {slot.doctor_name} at {slot.location} on {slot.date} at {slot.start_time}.")
+    return state
+
+
+def _intent(state: State, user_input: str) -> Optional[str]:
+    if not (state.get('scheduled') or state.get('cancelled')):
+        return None
+    lowered = user_input.lower()
+    if 'reschedule' in lowered:
+        return 'reschedule'
+    if 'cancel' in lowered:
+        return 'cancel'
+    return None
+
+
+def respond(state: State, user_input: str, graph) -> State:
+    # One chat turn: parse the message, then run the graph once all booking details are in
+    intent = _intent(state, user_input)
+    if intent:
+        _add_user(state, user_input)
+        fields = parse_message(user_input)
+        state['preferred_date'] = fields.get('date')
+        state['preferred_time'] = fields.get('time')
+    else:
+        state = greeting_agent(state, user_input)
+        if any(k in user_input.lower() for k in ['carrier', 'member', 'group']):
+            state = insurance_agent(state, user_input)
+    state['intent'] = intent
+    try:
+        if intent or (state.get('name') and state.get('dob') and state.get('doctor') and state.get('location') and state.get('is_new_patient') is None):
+            state = graph.invoke(state)
+    except FileNotFoundError as e:
+        _add_ai(state, f"Setup incomplete: {e}. Run data generator.")
+    except Exception as e:
+        _add_ai(state, f"An error occurred: {e}")
     return state
 
 
 def build_graph():
+    # langgraph is the slowest import on the request path; only pay for it when compiling
+    from langgraph.graph import StateGraph, END
+
     sg = StateGraph(dict)
 
     def greet_node(state: State) -> State:
@@ -252,13 +391,26 @@ def build_graph():
     def reminder_node(state: State) -> State:
         return reminder_agent(state)
 
-    sg.add_node('greet', greet_node)
-    sg.add_node('lookup', lookup_node)
-    sg.add_node('schedule', schedule_node)
-    sg.add_node('confirm', confirm_node)
-    sg.add_node('reminder', reminder_node)
-
-    sg.add_edge('greet', 'lookup')
+    def cancel_node(state: State) -> State:
+        return cancel_agent(state)
+
+    def reschedule_node(state: State) -> State:
+        return reschedule_agent(state)
+
+    # Each invocation is traced as one request, starting at the entry node
+    sg.add_node('greet', traced_node('greet', greet_node, new_trace=True))
+    sg.add_node('lookup', traced_node('lookup', lookup_node))
+    sg.add_node('schedule', traced_node('schedule', schedule_node))
+    sg.add_node('confirm', traced_node('confirm', confirm_node))
+    sg.add_node('reminder', traced_node('reminder', reminder_node))
+    sg.add_node('cancel', traced_node('cancel', cancel_node))
+    sg.add_node('reschedule', traced_node('reschedule', reschedule_node))
+
+    # Follow-up turns on a booked appointment skip the booking path
+    sg.add_conditional_edges('greet', lambda s: s.get('intent') or 'book',
+                             {'book': 'lookup', 'cancel': 'cancel', 'reschedule': 'reschedule'})
+    sg.add_edge('cancel', END)
+    sg.add_conditional_edges('reschedule', lambda s: 'confirm' if s.get('rescheduled') else END)
     sg.add_edge('lookup', 'schedule')
     sg.add_edge('schedule', 'confirm')
     sg.add_edge('confirm', 'reminder')
@@ -266,3 +418,30 @@ def build_graph():
     sg.set_finish_point('reminder')
 
     return sg.compile()
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    # One compiled graph per process, shared by every session
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
+
+
+def warmup() -> None:
+    """Compile the graph, start the reminder scheduler and load the indexes ahead of the first request."""
+    load_deferred()
+    get_graph()
+    get_reminder_scheduler()
+    for load in (get_patient_registry, get_slot_store, get_doctor_resolver):
+        try:
+            load()
+        except FileNotFoundError:
+            # No data yet; the index is built on first use instead
+            pass
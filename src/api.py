@@ -0,0 +1,189 @@
+"""Headless HTTP API for the scheduling conversation.
+
+    SCHEDULER_API_WORKERS=32 python src/api.py --port 8000
+
+Conversation state lives on the server, keyed by session id; clients only
+send messages. The graph and its pandas/storage work run in a bounded
+thread pool, so the event loop keeps accepting requests while bookings run.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel
+
+from agents.agents import get_graph, respond, warmup
+from utils.availability import search_availability
+
+WORKERS = int(os.environ.get('SCHEDULER_API_WORKERS', 32))
+# Requests waiting for a worker beyond this are turned away with 503
+MAX_QUEUED = int(os.environ.get('SCHEDULER_API_MAX_QUEUED', WORKERS * 16))
+SESSION_TTL = float(os.environ.get('SCHEDULER_SESSION_TTL', 30 * 60))
+MAX_SESSIONS = int(os.environ.get('SCHEDULER_MAX_SESSIONS', 100_000))
+
+
+class Session:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.state: Dict[str, Any] = {}
+        self.lock = asyncio.Lock()
+        self.touched = time.monotonic()
+
+
+class SessionStore:
+    """In-memory sessions, least recently used first, expired after SESSION_TTL."""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: 'OrderedDict[str, Session]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self) -> Session:
+        session = Session(uuid.uuid4().hex)
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.touched = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.touched >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class MessageIn(BaseModel):
+    text: str
+
+
+def _view(session: Session, since: int = 0) -> Dict[str, Any]:
+    state = session.state
+    return {
+        'session_id': session.session_id,
+        'replies': [m['content'] for m in state.get('messages', [])[since:] if m.get('type') == 'ai'],
+        'is_new_patient': state.get('is_new_patient'),
+        'scheduled': state.get('scheduled'),
+        'insurance': state.get('insurance'),
+        'confirmations': state.get('confirmations'),
+        'trace_id': state.get('trace_id'),
+    }
+
+
+sessions = SessionStore()
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='scheduler-api')
+_slots = asyncio.BoundedSemaphore(WORKERS + MAX_QUEUED)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Compile the graph and load the indexes before the first conversation instead of during it
+    await asyncio.get_running_loop().run_in_executor(_executor, warmup)
+    yield
+    _executor.shutdown(wait=True)
+
+
+app = FastAPI(title="Medical Scheduling API", lifespan=_lifespan)
+
+
+@app.get('/health')
+async def health() -> Dict[str, Any]:
+    return {'status': 'ok', 'sessions': len(sessions)}
+
+
+@app.get('/availability')
+async def availability(doctor: str = '', location: str = '', slot_type: Optional[List[str]] = Query(None),
+                       date_from: Optional[str] = None, date_to: Optional[str] = None,
+                       time_from: Optional[str] = None, time_to: Optional[str] = None,
+                       weekday: Optional[List[int]] = Query(None), limit: int = Query(10, ge=1, le=500)) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    try:
+        slots = await loop.run_in_executor(_executor, lambda: search_availability(
+            doctor, location, slot_type, date_from, date_to, time_from, time_to, weekday, limit))
+    except ValueError as e:
+        raise HTTPException(422, f"Invalid date or time: {e}")
+    return {'slots': slots}
+
+
+@app.post('/sessions', status_code=201)
+async def create_session() -> Dict[str, Any]:
+    return _view(sessions.create())
+
+
+@app.get('/sessions/{session_id}')
+async def get_session(session_id: str) -> Dict[str, Any]:
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(404, "Unknown or expired session")
+    return dict(_view(session), messages=session.state.get('messages', []))
+
+
+@app.delete('/sessions/{session_id}', status_code=204)
+async def delete_session(session_id: str) -> None:
+    if not sessions.delete(session_id):
+        raise HTTPException(404, "Unknown or expired session")
+
+
+@app.post('/sessions/{session_id}/messages')
+async def post_message(session_id: str, message: MessageIn) -> Dict[str, Any]:
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(404, "Unknown or expired session")
+    if _slots.locked():
+        raise HTTPException(503, "Server busy, please retry")
+    async with _slots:
+        # Messages in one conversation are applied in order
+        async with session.lock:
+            since = len(session.state.get('messages', []))
+            loop = asyncio.get_running_loop()
+            session.state = await loop.run_in_executor(
+                _executor, respond, session.state, message.text, get_graph())
+            return _view(session, since)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the scheduling conversation over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
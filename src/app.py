@@ -6,14 +6,30 @@ from pathlib import Path
 # Add src directory to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from agents.agents import greeting_agent, insurance_agent, build_graph
-from utils.io_utils import load_patients, load_schedule
+from agents.agents import respond, warmup
+from agents import agents
+from utils.io_utils import compact_appointment_export
+from utils.patient_index import get_patient_registry
+from utils.admin_queries import page_slots, summary, totals
+from utils.storage import SlotFilter
+from utils.reminders import get_reminder_scheduler
+from utils import tracing
 
 st.set_page_config(page_title="Medical Scheduling AI Agent", layout="wide")
 
+
+@st.cache_resource
+def get_graph():
+    # Runs once per server process: compile the graph and load the indexes up front
+    warmup()
+    return agents.get_graph()
+
+
+# Pending reminders fire from server start, not only after the first conversation warms up
+get_reminder_scheduler()
+
 if 'state' not in st.session_state:
     st.session_state.state = {}
-    st.session_state.graph = build_graph()
 
 state = st.session_state.state
 
@@ -40,16 +56,7 @@ with col1:
     user_input: Optional[str] = st.chat_input(placeholder)
 
     if user_input:
-        state = greeting_agent(state, user_input)
-        if any(k in user_input.lower() for k in ['carrier', 'member', 'group']):
-            state = insurance_agent(state, user_input)
-        try:
-            if state.get('name') and state.get('dob') and state.get('doctor') and state.get('location') and state.get('is_new_patient') is None:
-                state = st.session_state.graph.invoke(state)
-        except FileNotFoundError as e:
-            state.setdefault('messages', []).append({'type':'ai','content': f"Setup incomplete: {e}. Run data generator."})
-        except Exception as e:
-            state.setdefault('messages', []).append({'type':'ai','content': f"An error occurred: {e}"})
+        state = respond(state, user_input, get_graph())
         st.session_state.state = state
         st.rerun()
 
@@ -57,17 +64,64 @@ with col2:
     st.subheader("Admin Panel")
     if st.button("Refresh Data"):
         st.rerun()
+    if st.button("Build Export Report"):
+        try:
+            count = compact_appointment_export()
+            st.success(f"appointments_export.xlsx rebuilt with {count} appointments.")
+        except Exception as e:
+            st.warning(f"Export failed: {e}")
     try:
-        patients = load_patients()
-        st.metric("Patients", len(patients))
+        st.metric("Patients", len(get_patient_registry()))
     except Exception as e:
         st.warning(f"Patients not found: {e}")
     try:
-        schedule = load_schedule()
-        booked = (~schedule['available']).sum()
-        st.metric("Booked Appointments", int(booked))
-        st.dataframe(schedule[schedule['available'] == False].tail(10), use_container_width=True)
+        counts = totals()
+        booked_col, free_col = st.columns(2)
+        booked_col.metric("Booked Appointments", counts['booked'])
+        free_col.metric("Free Slots", counts['free'])
+
+        with st.expander("Utilization"):
+            group = st.selectbox("Per", ["Doctor", "Location", "Day"], key='admin_group')
+            by = {'Doctor': ('doctor_id', 'location'), 'Location': ('location',), 'Day': ('date',)}[group]
+            st.dataframe(summary(by), use_container_width=True, hide_index=True)
+
+        # Only the page on screen is queried; the cursors of the pages before it allow going back
+        status = st.selectbox("Slots", ["Booked", "Free", "All"], key='admin_status')
+        doctor_id = st.text_input("Doctor ID", key='admin_doctor').strip()
+        location = st.text_input("Location", key='admin_location').strip()
+        date_from = st.text_input("From (YYYY-MM-DD)", key='admin_from').strip()
+        newest_first = st.checkbox("Latest first", value=True, key='admin_desc')
+        filters = SlotFilter(
+            doctor_ids=(doctor_id,) if doctor_id else None,
+            locations=(location,) if location else None,
+            date_from=date_from or None,
+            booked={'Booked': True, 'Free': False}.get(status),
+        )
+        if st.session_state.get('admin_query') != (filters, newest_first):
+            st.session_state.admin_query = (filters, newest_first)
+            st.session_state.admin_cursors = [None]
+        cursors = st.session_state.admin_cursors
+        page = page_slots(filters, descending=newest_first, cursor=cursors[-1])
+        st.dataframe(page.rows, use_container_width=True, hide_index=True)
+        prev_col, next_col = st.columns(2)
+        if prev_col.button("Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        if next_col.button("Next", disabled=page.next_cursor is None):
+            cursors.append(page.next_cursor)
+            st.rerun()
     except Exception as e:
         st.warning(f"Schedule not found: {e}")
+    with st.expander("Performance"):
+        stats = tracing.histograms()
+        if stats:
+            st.dataframe(
+                [{'span': name, **{k: v for k, v in h.items() if k != 'buckets'}} for name, h in stats.items()],
+                use_container_width=True,
+            )
+        trace = state.get('trace')
+        if trace:
+            st.caption(f"Last request {trace['trace_id']}: {trace['node_ms']} ms in nodes, {trace['io_ms']} ms in I/O")
+            st.dataframe(trace['spans'], use_container_width=True)
 
 st.caption("💡 Tip: First provide Name, DOB, Dr, Location. Then provide insurance details: Carrier, Member, Group.")
@@ -0,0 +1,43 @@
+"""Book a file of appointment requests in one go.
+
+    python src/batch_book.py requests.jsonl --output results.jsonl
+
+Each line (or CSV row) has name, dob, doctor, location and either an
+``insurance`` object or carrier/member_id/group_number fields.
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils import io_utils
+from utils.batch_booking import book_batch, load_requests
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Book a file of appointment requests in one transaction.")
+    parser.add_argument('requests', type=Path, help='.jsonl or .csv file of booking requests')
+    parser.add_argument('--data-dir', type=Path, help='use the data files in this directory')
+    parser.add_argument('--backend', choices=['sqlite', 'excel'], default=None)
+    parser.add_argument('--output', type=Path, help='write one JSON result per request here')
+    args = parser.parse_args(argv)
+
+    if args.data_dir or args.backend:
+        io_utils.use_data_dir(args.data_dir or io_utils.DATA_DIR, args.backend)
+    results = book_batch(load_requests(args.requests))
+
+    lines = ''.join(json.dumps(r, default=str) + '\n' for r in results)
+    if args.output:
+        args.output.write_text(lines)
+    else:
+        sys.stdout.write(lines)
+    counts = Counter(r['status'] for r in results)
+    print(', '.join(f"{n} {status}" for status, n in sorted(counts.items())), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Simulation of the slot-allocation strategies under synthetic demand.
+
+A schedule is generated with data_gen (doctors spread over a few
+locations) and one synthetic stream of requests is replayed against each
+strategy in utils.allocation, entirely in memory. Requests arrive during
+each schedule day; a share come from new patients, and a share name only a
+location rather than a doctor. Slots that have started can no longer be
+booked. Reports utilization (overall and its spread across the doctors of
+a location), wait from request to appointment, unserved requests and unused
+'new' slot hours as JSON.
+
+    python src/bench/allocation_sim.py --doctors 12 --locations 3 --days 20 --load 1.1 --new-share 0.03
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_gen import SLOT_TEMPLATES, _next_monday, _schedule_days, generate_doctors, iter_schedule_chunks
+from utils.allocation import STRATEGIES, Allocator, SplitNewSlots
+from utils.records import from_minutes, minutes_array
+from utils.slot_store import SlotStore
+from utils.snapshot import schedule_columns
+from utils.storage import BOOKING_COLUMNS, split_new_rows
+
+
+def make_schedule(doctors: int, locations: int, days: int, template: str, seed: int) -> pd.DataFrame:
+    roster = generate_doctors(doctors, seed=seed)
+    # Several doctors per location, so there is load to balance
+    roster['location'] = [f'Clinic {i % locations + 1}' for i in range(len(roster))]
+    day_arr = _schedule_days(_next_monday(), days, weekends=False)
+    return pd.concat(list(iter_schedule_chunks(roster, day_arr, SLOT_TEMPLATES[template])), ignore_index=True)
+
+
+def make_requests(schedule: pd.DataFrame, load: float, new_share: float, any_doctor: float,
+                  seed: int) -> List[Dict[str, object]]:
+    rng = np.random.default_rng(seed)
+    roster = schedule[['doctor_id', 'doctor_name', 'location']].drop_duplicates().to_dict('records')
+    days = sorted(schedule['date'].unique())
+    per_day = int(round(load * len(schedule) / len(days)))
+    requests = []
+    for day in days:
+        # Arrivals between 08:00 and 18:00
+        minutes = np.sort(minutes_array(pd.Series([day] * per_day), pd.Series(['08:00'] * per_day))
+                          + rng.integers(0, 600, per_day))
+        for minute in minutes:
+            doctor = roster[int(rng.integers(len(roster)))]
+            requests.append({
+                'minute': int(minute),
+                'slot_type': 'new' if rng.random() < new_share else 'returning',
+                'location': doctor['location'],
+                # A location-only request may go to any doctor there
+                'doctor_id': None if rng.random() < any_doctor else doctor['doctor_id'],
+            })
+    return requests
+
+
+class Simulation:
+    """One strategy run: the schedule frame, its in-memory SlotStore and the bookings so far."""
+
+    def __init__(self, schedule: pd.DataFrame):
+        self.schedule = schedule.copy()
+        self.bookings: List[Dict[str, str]] = []
+        self.now = 0
+        self.store = SlotStore.from_frame(self.schedule)
+
+    def split(self, since: int, until: int) -> int:
+        # What the storage backend does, on the in-memory frame
+        booked = {(b['doctor_id'], b['date'], b['start_time']) for b in self.bookings}
+        self.schedule['available'] = [k not in booked for k in zip(
+            self.schedule['doctor_id'], self.schedule['date'], self.schedule['start_time'])]
+        self.schedule, split = split_new_rows(self.schedule, ' '.join(from_minutes(since)),
+                                              ' '.join(from_minutes(until)))
+        return split
+
+    def reload(self) -> SlotStore:
+        bookings = pd.DataFrame(self.bookings, columns=BOOKING_COLUMNS)
+        self.store = SlotStore.from_snapshot(schedule_columns(self.schedule), bookings)
+        self.store.retire_before(self.now)
+        return self.store
+
+    def run(self, allocator: Allocator, requests: List[Dict[str, object]]) -> Dict[str, object]:
+        doctors = self.schedule[['doctor_id', 'location']].drop_duplicates().to_dict('records')
+        waits: List[int] = []
+        unserved = {'new': 0, 'returning': 0}
+        for i, request in enumerate(requests):
+            self.now = request['minute']
+            self.store.retire_before(self.now)
+            wanted = [d for d in doctors if d['location'] == request['location']
+                      and request['doctor_id'] in (None, d['doctor_id'])]
+            slot_types = [request['slot_type']]
+            self.store = allocator.prepare(self.store, wanted, slot_types)
+            slot = allocator.choose(self.store, self.store.keys_for(wanted, slot_types))
+            if slot is None:
+                unserved[request['slot_type']] += 1
+                continue
+            self.store.mark_booked(slot.doctor_id, slot.date, slot.start_time, f'A{i}', f'P{i}')
+            self.bookings.append({'doctor_id': slot.doctor_id, 'date': slot.date, 'start_time': slot.start_time,
+                                  'appointment_id': f'A{i}', 'patient_id': f'P{i}'})
+            waits.append(slot.start - request['minute'])
+        return self._report(waits, unserved, len(requests))
+
+    def _report(self, waits: List[int], unserved: Dict[str, int], requests: int) -> Dict[str, object]:
+        df = self.schedule
+        minutes = minutes_array(df['date'], df['end_time']) - minutes_array(df['date'], df['start_time'])
+        booked = {(b['doctor_id'], b['date'], b['start_time']) for b in self.bookings}
+        is_booked = np.array([k in booked for k in zip(df['doctor_id'], df['date'], df['start_time'])])
+        per_doctor = pd.DataFrame({'doctor_id': df['doctor_id'], 'location': df['location'],
+                                   'total': minutes, 'booked': minutes * is_booked})
+        per_doctor = per_doctor.groupby(['location', 'doctor_id'])[['total', 'booked']].sum()
+        utilization = per_doctor['booked'] / per_doctor['total']
+        spread = utilization.groupby(level='location').agg(lambda u: u.std(ddof=0) / u.mean() if u.mean() else 0.0)
+        wait_h = np.asarray(waits, dtype=np.float64) / 60
+        return {
+            'requests': requests,
+            'served': len(waits),
+            'unserved': unserved,
+            'utilization': round(float(per_doctor['booked'].sum() / per_doctor['total'].sum()), 4),
+            'doctor_utilization_min': round(float(utilization.min()), 4),
+            'doctor_utilization_max': round(float(utilization.max()), 4),
+            # Coefficient of variation of utilization across a location's doctors, averaged
+            'utilization_cv_within_location': round(float(spread.mean()), 4),
+            'wait_hours': {
+                'mean': round(float(wait_h.mean()), 2) if len(wait_h) else None,
+                'p50': round(float(np.percentile(wait_h, 50)), 2) if len(wait_h) else None,
+                'p95': round(float(np.percentile(wait_h, 95)), 2) if len(wait_h) else None,
+            },
+            'unused_new_slot_hours': round(float(minutes[(df['slot_type'] == 'new').to_numpy() & ~is_booked].sum() / 60), 1),
+            'slots_after_splits': len(df),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--doctors', type=int, default=12)
+    parser.add_argument('--locations', type=int, default=3)
+    parser.add_argument('--days', type=int, default=28, help='calendar days of schedule (weekdays only)')
+    parser.add_argument('--template', choices=sorted(SLOT_TEMPLATES), default='standard')
+    parser.add_argument('--load', type=float, default=0.9, help='requests per day as a share of slots per day')
+    parser.add_argument('--new-share', type=float, default=0.03, help='share of requests from new patients')
+    parser.add_argument('--any-doctor', type=float, default=0.6, help='share of requests naming only a location')
+    parser.add_argument('--strategies', nargs='+', choices=sorted(STRATEGIES), default=list(STRATEGIES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=Path, help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    schedule = make_schedule(args.doctors, args.locations, args.days, args.template, args.seed)
+    requests = make_requests(schedule, args.load, args.new_share, args.any_doctor, args.seed)
+    report: Dict[str, object] = {'config': {k: v for k, v in vars(args).items() if k not in ('strategies', 'output')},
+                                 'slots': len(schedule), 'strategies': {}}
+    for name in args.strategies:
+        sim = Simulation(schedule)
+        if name == SplitNewSlots.name:
+            allocator = SplitNewSlots(split=sim.split, reload=sim.reload, clock=lambda: sim.now)
+        else:
+            allocator = STRATEGIES[name]()
+        report['strategies'][name] = sim.run(allocator, requests)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Cold-start benchmark: module import time and time to the first response.
+
+Every sample runs in a fresh interpreter. With --ref the same measurements
+are taken on another commit (extracted with git archive) so the two can be
+compared side by side. Modules the ref does not have are reported as null.
+
+    python src/bench/import_bench.py --runs 7
+    python src/bench/import_bench.py --ref HEAD~1 --output cold_start.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SRC_DIR = Path(__file__).resolve().parents[1]
+BASE_DIR = SRC_DIR.parent
+
+MODULES = ['utils.io_utils', 'utils.slot_store', 'agents.agents', 'api']
+
+# Import, load the indexes and answer one message, timing each stage. Older refs have no
+# use_data_dir (their paths are module globals read at call time) and no respond(): the
+# original app ran greeting_agent and then invoked the graph.
+FIRST_RESPONSE = """
+import json, sys, time
+from pathlib import Path
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from utils import io_utils
+data = Path(sys.argv[2])
+if hasattr(io_utils, 'use_data_dir'):
+    io_utils.use_data_dir(data, 'sqlite')
+else:
+    io_utils.PATIENTS_CSV = data / 'patients.csv'
+    io_utils.DOCTOR_XLSX = data / 'doctor_schedule.xlsx'
+    io_utils.APPT_EXPORT_XLSX = data / 'appointments_export.xlsx'
+from agents import agents
+imported = time.perf_counter()
+graph = agents.build_graph()
+message = 'Name: Cold Start, DOB: 1990-01-01'
+if hasattr(agents, 'respond'):
+    agents.respond({}, message, graph)
+else:
+    graph.invoke(agents.greeting_agent({}, message))
+print(json.dumps({'import_ms': (imported - start) * 1e3, 'first_response_ms': (time.perf_counter() - start) * 1e3}))
+"""
+
+
+def _import_ms(src: Path, module: str) -> float:
+    code = (f"import sys, time; sys.path.insert(0, {str(src)!r}); start = time.perf_counter(); "
+            f"import {module}; print((time.perf_counter() - start) * 1e3)")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=src)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _has_module(src: Path, module: str) -> bool:
+    path = src.joinpath(*module.split('.'))
+    return path.with_suffix('.py').exists() or (path / '__init__.py').exists()
+
+
+def measure(src: Path, data_dir: Path, runs: int) -> Dict[str, Optional[Dict[str, float]]]:
+    modules = [m for m in MODULES if _has_module(src, m)]
+    samples: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        for module in modules:
+            samples.setdefault(f'import {module}', []).append(_import_ms(src, module))
+        out = subprocess.run([sys.executable, '-c', FIRST_RESPONSE, str(src), str(data_dir)],
+                             capture_output=True, text=True, check=True, cwd=src)
+        for k, v in json.loads(out.stdout.strip().splitlines()[-1]).items():
+            samples.setdefault(k, []).append(v)
+    report: Dict[str, Optional[Dict[str, float]]] = {f'import {m}': None for m in MODULES}
+    report.update({k: {'median_ms': round(statistics.median(v), 1), 'min_ms': round(min(v), 1)}
+                   for k, v in samples.items()})
+    return report
+
+
+def _checkout(ref: str, dest: Path) -> Path:
+    archive = dest / 'src.tar'
+    subprocess.run(['git', 'archive', '--format=tar', '-o', str(archive), ref, 'src'],
+                   cwd=BASE_DIR, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(dest)
+    return dest / 'src'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--ref', help='also measure this git ref for comparison')
+    parser.add_argument('--output', type=Path, help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(SRC_DIR))
+    from data_gen import GeneratorConfig, write_dataset
+
+    report: Dict[str, object] = {'runs': args.runs}
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'data'
+        config = GeneratorConfig(patients=10_000, doctors=50, days=60)
+        write_dataset(config, data_dir, 'sqlite')
+        if args.ref:
+            # Refs from before the SQLite store read the schedule from the workbook
+            write_dataset(config, Path(tmp) / 'xlsx', 'xlsx')
+            (Path(tmp) / 'xlsx' / 'doctor_schedule.xlsx').rename(data_dir / 'doctor_schedule.xlsx')
+        report['current'] = measure(SRC_DIR, data_dir, args.runs)
+        if args.ref:
+            report[args.ref] = measure(_checkout(args.ref, Path(tmp)), data_dir, args.runs)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Load test for the HTTP API (src/api.py).
+
+Runs many concurrent scripted conversations against a running instance, or
+with --spawn starts one on a freshly generated dataset first, and reports
+per-request latency percentiles, conversations per second and errors as JSON.
+
+    python src/bench/load_test.py --spawn --conversations 2000 --concurrency 300
+    python src/bench/load_test.py --url http://127.0.0.1:8000
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SRC_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SRC_DIR))
+
+import httpx
+import numpy as np
+
+from bench.pipeline_bench import summarize
+from data_gen import GeneratorConfig, write_dataset
+
+
+def _doctors(data_dir: Optional[Path]) -> List[Dict[str, str]]:
+    # Read the same data files as the server so requests name real doctors
+    from utils import io_utils
+    if data_dir is not None:
+        io_utils.use_data_dir(data_dir, 'sqlite')
+    doctors = io_utils.load_doctors()
+    if doctors.empty:
+        doctors = io_utils.load_schedule()[['doctor_name', 'location']].drop_duplicates()
+        doctors = doctors.rename(columns={'doctor_name': 'name'})
+    return doctors[['name', 'location']].to_dict('records')
+
+
+def _scripts(n: int, doctors: List[Dict[str, str]], seed: int) -> List[List[str]]:
+    rng = np.random.default_rng(seed)
+    scripts = []
+    for i in range(n):
+        d = doctors[int(rng.integers(len(doctors)))]
+        scripts.append([
+            f"Name: Load Tester{i}, DOB: 1990-01-01",
+            "Carrier: Star Health; Member: ABC12345; Group: 987654",
+            f"Dr: {d['name']}, Location: {d['location']}",
+        ])
+    return scripts
+
+
+async def _conversation(client: httpx.AsyncClient, script: List[str], latencies: Dict[str, List[int]],
+                        outcome: Dict[str, int]) -> None:
+    try:
+        start = time.perf_counter_ns()
+        resp = await client.post('/sessions')
+        latencies['create'].append(time.perf_counter_ns() - start)
+        resp.raise_for_status()
+        session_id = resp.json()['session_id']
+        body = {}
+        for message in script:
+            start = time.perf_counter_ns()
+            resp = await client.post(f'/sessions/{session_id}/messages', json={'text': message})
+            latencies['message'].append(time.perf_counter_ns() - start)
+            if resp.status_code == 503:
+                outcome['rejected'] += 1
+                return
+            resp.raise_for_status()
+            body = resp.json()
+        outcome['booked' if body.get('scheduled') else 'unbooked'] += 1
+        await client.delete(f'/sessions/{session_id}')
+    except httpx.HTTPError:
+        outcome['errors'] += 1
+
+
+async def run(url: str, scripts: List[List[str]], concurrency: int) -> Dict[str, object]:
+    latencies: Dict[str, List[int]] = {'create': [], 'message': []}
+    outcome = {'booked': 0, 'unbooked': 0, 'rejected': 0, 'errors': 0}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    gate = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        async def one(script: List[str]) -> None:
+            async with gate:
+                await _conversation(client, script, latencies, outcome)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(s) for s in scripts))
+        elapsed = time.perf_counter() - start
+    return {
+        'conversations': len(scripts),
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 2),
+        'conversations_per_s': round(len(scripts) / elapsed, 1),
+        'outcome': outcome,
+        # Requests overlap, so per-request throughput from summarize() is meaningless here
+        'latency': {k: {m: x for m, x in summarize(v).items() if m != 'throughput_per_s'}
+                    for k, v in latencies.items() if v},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_healthy(url: str, proc: subprocess.Popen, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API server exited with {proc.returncode}")
+        try:
+            if httpx.get(f'{url}/health', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API server did not become healthy")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--spawn', action='store_true', help='start a local server on a generated dataset')
+    parser.add_argument('--doctors', type=int, default=50, help='doctors in the --spawn dataset')
+    parser.add_argument('--days', type=int, default=60, help='days of slots in the --spawn dataset')
+    parser.add_argument('--workers', type=int, default=32, help='API thread pool size for --spawn')
+    parser.add_argument('--conversations', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=Path, help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    proc: Optional[subprocess.Popen] = None
+    tmp = tempfile.TemporaryDirectory() if args.spawn else None
+    try:
+        if tmp is not None:
+            config = GeneratorConfig(patients=1_000, doctors=args.doctors, days=args.days, seed=args.seed)
+            write_dataset(config, Path(tmp.name), 'sqlite')
+            url = f'http://127.0.0.1:{_free_port()}'
+            env = dict(os.environ, SCHEDULER_DATA_DIR=tmp.name, SCHEDULER_BACKEND='sqlite',
+                       SCHEDULER_API_WORKERS=str(args.workers))
+            proc = subprocess.Popen(
+                [sys.executable, str(SRC_DIR / 'api.py'), '--port', url.rsplit(':', 1)[1]],
+                env=env, stdout=subprocess.DEVNULL)
+            _wait_healthy(url, proc)
+        else:
+            url = args.url
+        doctors = _doctors(Path(tmp.name) if tmp is not None else None)
+        report = asyncio.run(run(url, _scripts(args.conversations, doctors, args.seed), args.concurrency))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(30)
+        if tmp is not None:
+            tmp.cleanup()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Micro-benchmark: legacy per-key extraction vs the single-pass message parser.
+
+The corpus is every title/body in a JSONL file (default: requests.jsonl at
+the repo root) mixed with typical intake and insurance messages.
+
+    python src/bench/parser_bench.py --repeat 200
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.message_parser import parse_message
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+SAMPLE_MESSAGES = [
+    "Name: Arjun Sharma, DOB: 1990-08-23, Dr: Arjun Sharma, Location: Mumbai Central",
+    "Carrier: Star Health; Member: ABC12345; Group: 987654",
+    "Hi, I'd like to book. Name: Sana Khan",
+    "DOB: 1985-02-11, Location: Delhi Connaught Place",
+    "Dr: Maria D'Souza",
+]
+
+
+def legacy_extract(user_input: str) -> Dict[str, str]:
+    # The greeting/insurance extraction this parser replaced, kept for comparison
+    state: Dict[str, str] = {}
+    lower = user_input.lower()
+    for key, target in [('name:', 'name'), ('dob:', 'dob'), ('dr:', 'doctor'), ('location:', 'location')]:
+        if key in lower:
+            key_index = lower.find(key)
+            colon_index = user_input.find(':', key_index)
+            if colon_index != -1:
+                value = user_input[colon_index + 1:].strip()
+                if ',' in value:
+                    value = value.split(',')[0].strip()
+                state[target] = value
+    if 'carrier' in lower:
+        state['carrier'] = user_input.split(':')[-1].strip()
+    if 'member' in lower:
+        state['member_id'] = user_input.split(':')[-1].strip()
+    if 'group' in lower:
+        state['group_number'] = user_input.split(':')[-1].strip()
+    return state
+
+
+def load_corpus(path: Path) -> List[str]:
+    corpus = list(SAMPLE_MESSAGES)
+    if path.exists():
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                if line.strip():
+                    record = json.loads(line)
+                    corpus.extend(str(record[k]) for k in ('title', 'body') if record.get(k))
+    return corpus
+
+
+def bench(fn: Callable[[str], Dict[str, str]], corpus: List[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in corpus:
+            fn(message)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', type=Path, default=BASE_DIR / 'requests.jsonl')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    chars = sum(len(m) for m in corpus) * args.repeat
+    results = {}
+    for label, fn in [('legacy', legacy_extract), ('parser', parse_message)]:
+        elapsed = bench(fn, corpus, args.repeat)
+        results[label] = {
+            'seconds': round(elapsed, 4),
+            'messages_per_sec': round(len(corpus) * args.repeat / elapsed),
+            'mb_per_sec': round(chars / elapsed / 1e6, 2),
+        }
+    results['messages'] = len(corpus) * args.repeat
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""End-to-end benchmark for the booking pipeline.
+
+For each dataset size a fresh dataset is generated with data_gen, then
+scripted conversations are replayed through greeting_agent/insurance_agent,
+every graph node on its own, and the compiled graph end to end. Latency
+percentiles and throughput are emitted as JSON so runs can be compared
+between commits.
+
+    python src/bench/pipeline_bench.py --sizes small medium --output bench.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from data_gen import GeneratorConfig, write_dataset
+
+SIZES: Dict[str, GeneratorConfig] = {
+    'small': GeneratorConfig(patients=1_000, doctors=10, days=14),
+    'medium': GeneratorConfig(patients=100_000, doctors=200, days=90),
+    'large': GeneratorConfig(patients=1_000_000, doctors=1_000, days=365),
+}
+
+
+def summarize(samples_ns: List[int]) -> Dict[str, float]:
+    ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    total_s = ms.sum() / 1e3
+    return {
+        'count': len(ms),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'mean_ms': round(float(ms.mean()), 3),
+        'throughput_per_s': round(len(ms) / total_s, 1) if total_s else None,
+    }
+
+
+def _timed(fn: Callable, *args) -> int:
+    start = time.perf_counter_ns()
+    fn(*args)
+    return time.perf_counter_ns() - start
+
+
+def _conversations(data_dir: Path, n: int, seed: int) -> List[List[str]]:
+    import pandas as pd
+    from utils import io_utils
+
+    rng = np.random.default_rng(seed)
+    patients = pd.read_csv(data_dir / 'patients.csv', usecols=['first_name', 'last_name', 'dob'])
+    doctors = io_utils.load_doctors()
+    scripts = []
+    for i in range(n):
+        if i % 2:
+            p = patients.iloc[int(rng.integers(len(patients)))]
+            name, dob = f"{p.first_name} {p.last_name}", p.dob
+        else:
+            name, dob = f"Bench Newpatient{i}", '1990-01-01'
+        d = doctors.iloc[int(rng.integers(len(doctors)))]
+        scripts.append([
+            f"Name: {name}, DOB: {dob}",
+            f"Dr: {d['name']}, Location: {d['location']}",
+            "Carrier: Star Health; Member: ABC12345; Group: 987654",
+        ])
+    return scripts
+
+
+def run_size(data_dir: Path, conversations: int, seed: int) -> Dict[str, object]:
+    # Runs in its own process so every module-level cache starts cold for this dataset
+    from utils import io_utils
+    io_utils.use_data_dir(data_dir, 'sqlite')
+    from utils.notifications import MemoryTransport, NotificationDispatcher, set_dispatcher
+    set_dispatcher(NotificationDispatcher(MemoryTransport()))
+    from agents import agents
+
+    scripts = _conversations(data_dir, conversations, seed)
+    timings: Dict[str, List[int]] = {k: [] for k in [
+        'greeting', 'insurance', 'lookup', 'schedule', 'confirm', 'reminder', 'graph_compile', 'end_to_end']}
+
+    # Warm caches (registry, slot store, resolver) so percentiles reflect steady state
+    start = time.perf_counter_ns()
+    graph = agents.build_graph()
+    timings['graph_compile'].append(time.perf_counter_ns() - start)
+    cold_start = time.perf_counter_ns()
+    agents.patient_lookup_agent({'name': 'Warm Up', 'dob': '1900-01-01'})
+    agents.get_slot_store()
+    agents.get_doctor_resolver()
+    cold_ns = time.perf_counter_ns() - cold_start
+
+    half = len(scripts) // 2
+    # First half: each node on its own, in graph order
+    for script in scripts[:half]:
+        state: Dict[str, object] = {}
+        for message in script[:2]:
+            timings['greeting'].append(_timed(agents.greeting_agent, state, message))
+        timings['insurance'].append(_timed(agents.insurance_agent, state, script[2]))
+        for key, node in [('lookup', agents.patient_lookup_agent), ('schedule', agents.scheduling_agent),
+                          ('confirm', agents.confirmation_agent), ('reminder', agents.reminder_agent)]:
+            timings[key].append(_timed(node, state))
+    # Second half: the compiled graph end to end
+    for script in scripts[half:]:
+        state = {}
+        for message in script[:2]:
+            agents.greeting_agent(state, message)
+        agents.insurance_agent(state, script[2])
+        timings['end_to_end'].append(_timed(graph.invoke, state))
+
+    agents.get_dispatcher().flush(10)
+    return {
+        'cold_cache_ms': round(cold_ns / 1e6, 3),
+        'nodes': {k: summarize(v) for k, v in timings.items() if v},
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=['small', 'medium'])
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=Path, help='write JSON here instead of stdout')
+    parser.add_argument('--worker', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_size(args.worker, args.conversations, args.seed)))
+        return
+
+    report: Dict[str, object] = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'conversations': args.conversations,
+        'seed': args.seed,
+        'sizes': {},
+    }
+    for size in args.sizes:
+        config = SIZES[size]
+        config.seed = args.seed
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            write_dataset(config, Path(tmp), 'sqlite')
+            generate_s = time.perf_counter() - start
+            out = subprocess.run(
+                [sys.executable, __file__, '--worker', tmp, '--conversations', str(args.conversations),
+                 '--seed', str(args.seed)],
+                capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+        result['dataset'] = {'patients': config.patients, 'doctors': config.doctors, 'days': config.days,
+                             'generate_s': round(generate_s, 2)}
+        report['sizes'][size] = result
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Per-process memory of the patient and slot indexes across several worker processes.
+
+Starts --workers processes on one generated dataset. Each loads the indexes
+either from the memory-mapped snapshots (the default path) or from private
+pandas copies (load_patients/load_schedule, the old path), waits until all
+are loaded, and reports its resident (RSS) and proportional (PSS) memory.
+PSS splits shared pages between the processes mapping them, so its sum is
+the real footprint. Linux only (reads /proc/self/smaps_rollup).
+
+    python src/bench/snapshot_bench.py --workers 4 --patients 1000000
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+SRC_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SRC_DIR))
+
+
+def _memory_kb() -> Dict[str, int]:
+    fields = {}
+    with open('/proc/self/smaps_rollup') as fh:
+        for line in fh:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                fields[parts[0][:-1].lower()] = int(parts[1])
+    return fields
+
+
+def _worker(data_dir: str, mode: str, barrier, results) -> None:
+    from utils import io_utils
+    io_utils.use_data_dir(Path(data_dir), 'sqlite')
+    start = time.perf_counter()
+    if mode == 'snapshot':
+        from utils.patient_index import get_patient_registry
+        from utils.slot_store import get_slot_store
+        from utils.snapshot import patients_snapshot, schedule_snapshot
+        get_patient_registry().lookup('warm', 'up', '1990-01-01')
+        get_slot_store()
+        # Fault in every mapped page, as a long-running worker eventually would
+        for table in (patients_snapshot(), schedule_snapshot()):
+            for name in table.manifest['columns']:
+                int(table[name].view(np.uint8).sum())
+    else:
+        from utils.slot_store import SlotStore
+        patients = io_utils.load_patients()  # noqa: F841
+        store = SlotStore.from_frame(io_utils.load_schedule())  # noqa: F841
+    load_s = time.perf_counter() - start
+    barrier.wait()
+    results.put(dict(_memory_kb(), load_s=round(load_s, 2)))
+    barrier.wait()
+
+
+def run(data_dir: Path, mode: str, workers: int) -> Dict[str, object]:
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(str(data_dir), mode, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    samples = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return {
+        'workers': workers,
+        'rss_mb_per_worker': round(sum(s['rss'] for s in samples) / workers / 1024, 1),
+        'pss_mb_total': round(sum(s['pss'] for s in samples) / 1024, 1),
+        'load_s_max': max(s['load_s'] for s in samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--patients', type=int, default=200_000)
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--output', type=Path, help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    from data_gen import GeneratorConfig, write_dataset
+
+    report: Dict[str, object] = {'patients': args.patients, 'doctors': args.doctors, 'days': args.days}
+    with tempfile.TemporaryDirectory() as tmp:
+        write_dataset(GeneratorConfig(patients=args.patients, doctors=args.doctors, days=args.days, seed=42),
+                      Path(tmp), 'sqlite')
+        for mode in ('pandas', 'snapshot'):
+            report[mode] = run(Path(tmp), mode, args.workers)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
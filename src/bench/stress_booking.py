@@ -0,0 +1,104 @@
+"""Concurrent booking stress check.
+
+Dozens of threads across several processes book the same doctor at once,
+then the live store is checked for double-booked slots. Exits non-zero if
+any slot was handed to more than one booker.
+
+    python src/bench/stress_booking.py --processes 4 --threads 50
+"""
+from __future__ import annotations
+import argparse
+import multiprocessing as mp
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+
+from data_gen import generate_doctor_schedule, DOCTORS
+from utils import io_utils
+from agents.agents import scheduling_agent
+
+Booking = Tuple[str, str, str, str, str]  # (patient, appointment_id, doctor_id, date, start_time)
+
+
+def _book(i: int) -> Optional[Booking]:
+    doctor = DOCTORS[0]
+    patient = f"Stress Patient{i}"
+    state = scheduling_agent({
+        'name': patient,
+        'doctor': doctor['name'],
+        'location': doctor['location'],
+        'is_new_patient': False,
+    })
+    slot = state.get('scheduled')
+    if not slot:
+        return None
+    return (patient, slot['appointment_id'], doctor['doctor_id'], slot['date'], slot['start_time'])
+
+
+def _run_process(data_dir: str, backend: str, start: int, count: int, threads: int) -> List[Optional[Booking]]:
+    io_utils.use_data_dir(Path(data_dir), backend)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(_book, range(start, start + count)))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=50, help='bookers per process')
+    parser.add_argument('--backend', choices=['sqlite', 'excel'], default='sqlite')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        io_utils.use_data_dir(data_dir, args.backend)
+        # From tomorrow: the live store retires slots that have started, which would shrink `free`
+        schedule = generate_doctor_schedule(start_date=date.today() + timedelta(days=1))
+        with pd.ExcelWriter(io_utils.DOCTOR_XLSX, engine='openpyxl') as writer:
+            schedule.to_excel(writer, sheet_name='schedule', index=False)
+            pd.DataFrame(DOCTORS).to_excel(writer, sheet_name='doctors', index=False)
+        # Seed the store once before the workers race for it
+        io_utils.load_schedule()
+        free = int(((schedule['doctor_id'] == DOCTORS[0]['doctor_id']) & (schedule['slot_type'] == 'returning')).sum())
+
+        ctx = mp.get_context('spawn')
+        with ctx.Pool(args.processes) as pool:
+            parts = pool.starmap(_run_process, [
+                (tmp, args.backend, p * args.threads, args.threads, args.threads)
+                for p in range(args.processes)
+            ])
+        results = [b for part in parts for b in part]
+        booked = [b for b in results if b is not None]
+
+        errors = []
+        dupes = [k for k, n in Counter(b[2:] for b in booked).items() if n > 1]
+        if dupes:
+            errors.append(f"{len(dupes)} slots reported as booked by more than one caller, e.g. {dupes[0]}")
+        stored = io_utils.load_schedule()
+        stored = stored[stored['patient_id'].astype(str).str.startswith('Stress Patient')]
+        owners = {(r.doctor_id, r.date, r.start_time): (r.patient_id, r.appointment_id) for r in stored.itertuples()}
+        for patient, appointment_id, *slot in booked:
+            if owners.get(tuple(slot)) != (patient, appointment_id):
+                errors.append(f"{patient} was told {tuple(slot)} but the store holds {owners.get(tuple(slot))}")
+        if len(stored) != len(booked):
+            errors.append(f"store has {len(stored)} stress bookings, callers reported {len(booked)}")
+        if len(booked) != min(len(results), free):
+            errors.append(f"expected {min(len(results), free)} bookings from {free} free slots, got {len(booked)}")
+
+        print(f"bookers={len(results)} free_slots={free} booked={len(booked)} rejected={len(results) - len(booked)}")
+        for error in errors:
+            print(f"FAIL: {error}")
+        if not errors:
+            print("OK: no double-booking")
+        return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
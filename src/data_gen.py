@@ -1,6 +1,8 @@
-import random
-import string
-from datetime import date, timedelta, datetime
+import argparse
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
@@ -23,6 +25,7 @@ STREETS = ['MG Road','Link Road','Park Street','Church Street','Station Road','T
 CITIES = ['Mumbai','Delhi','Bengaluru','Hyderabad','Chennai']
 STATES = ['MH','DL','KA','TS','TN']
 INSURERS = ['Blue Cross','Aetna','UnitedHealth','Cigna','Star Health']
+CLINIC_AREAS = ['Central','Andheri','Connaught Place','Saket','Indiranagar','Koramangala','Banjara Hills','T Nagar']
 
 DOCTORS = [
     {'doctor_id': 'D100', 'name': 'Dr. Arjun Sharma', 'location': 'Mumbai Central'},
@@ -30,98 +33,249 @@ DOCTORS = [
     {'doctor_id': 'D300', 'name': "Dr. Maria D'Souza", 'location': 'Bengaluru Indiranagar'},
 ]
 
+# A day's slots as (duration in minutes, slot_type), laid out back to back from DAY_START
+SLOT_TEMPLATES = {
+    # First slot 60min for new patients, rest 30min
+    'standard': [(60, 'new')] + [(30, 'returning')] * 14,
+    # New-patient slots at the start of the morning and afternoon sessions
+    'split': [(60, 'new')] + [(30, 'returning')] * 6 + [(60, 'new')] + [(30, 'returning')] * 6,
+}
+DAY_START = 9 * 60
+
+SCHEDULE_COLUMNS = [
+    'doctor_id', 'doctor_name', 'location', 'date', 'start_time', 'end_time',
+    'slot_type', 'available', 'appointment_id', 'patient_id',
+]
+_ID_ALPHABET = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'))
+
+
+@dataclass
+class GeneratorConfig:
+    patients: int = 50
+    doctors: int = 3
+    days: int = 14
+    template: str = 'standard'
+    weekends: bool = False
+    seed: Optional[int] = None
+    chunk_size: int = 100_000
+    start_date: Optional[date] = None
 
-def random_phone() -> str:
-    return f"({random.randint(200,999)}) {random.randint(200,999)}-{random.randint(1000,9999)}"
 
+def _next_monday() -> date:
+    # next Monday or today if Monday
+    return date.today() + timedelta(days=(7 - date.today().weekday()) % 7)
 
-def random_email(first: str, last: str) -> str:
-    domain = random.choice(['gmail.com','yahoo.com','outlook.com','example.com'])
-    return f"{first.lower()}.{last.lower()}{random.randint(1,99)}@{domain}"
 
+def _pick(rng: np.random.Generator, values: List[str], n: int) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
 
-def random_dob(min_age=18, max_age=90) -> date:
-    today = date.today()
-    age = random.randint(min_age, max_age)
-    days_offset = random.randint(0, 365)
-    return today.replace(year=today.year - age) - timedelta(days=days_offset)
 
+def _digits(rng: np.random.Generator, low: int, high: int, n: int) -> pd.Series:
+    return pd.Series(rng.integers(low, high + 1, n)).astype(str)
 
-def random_member_id() -> str:
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
 
+def _random_codes(rng: np.random.Generator, alphabet: np.ndarray, length: int, n: int) -> np.ndarray:
+    chars = np.ascontiguousarray(alphabet[rng.integers(0, len(alphabet), (n, length))])
+    return chars.view(f'U{length}').ravel().astype(object)
 
-def random_group_number() -> str:
-    return ''.join(random.choices(string.digits, k=6))
 
+def _phones(rng: np.random.Generator, n: int) -> pd.Series:
+    return '(' + _digits(rng, 200, 999, n) + ') ' + _digits(rng, 200, 999, n) + '-' + _digits(rng, 1000, 9999, n)
 
-def generate_patients(n: int = 50) -> pd.DataFrame:
-    rows = []
-    for i in range(n):
-        first = random.choice(FIRST_NAMES)
-        last = random.choice(LAST_NAMES)
-        row = {
-            'patient_id': f"P{1000+i}",
+
+def iter_patient_chunks(n: int, rng: np.random.Generator, chunk_size: int = 100_000,
+                        start_id: int = 1000) -> Iterator[pd.DataFrame]:
+    today = np.datetime64(date.today(), 'D')
+    for offset in range(0, n, chunk_size):
+        m = min(chunk_size, n - offset)
+        first = _pick(rng, FIRST_NAMES, m)
+        last = _pick(rng, LAST_NAMES, m)
+        ages = rng.integers(18, 91, m)
+        dob = today - (ages * 365.25).astype('timedelta64[D]') - rng.integers(0, 366, m).astype('timedelta64[D]')
+        domain = _pick(rng, ['gmail.com', 'yahoo.com', 'outlook.com', 'example.com'], m)
+        first_s = pd.Series(first)
+        last_s = pd.Series(last)
+        yield pd.DataFrame({
+            'patient_id': 'P' + pd.Series(np.arange(start_id + offset, start_id + offset + m)).astype(str),
             'first_name': first,
             'last_name': last,
-            'dob': random_dob().isoformat(),
-            'gender': random.choice(['Male','Female','Other']),
-            'phone': random_phone(),
-            'email': random_email(first, last),
-            'address': f"{random.randint(100,9999)} {random.choice(STREETS)}",
-            'city': random.choice(CITIES),
-            'state': random.choice(STATES),
-            'zip': f"{random.randint(10000,99999)}",
-            'emergency_contact_name': f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
-            'emergency_contact_phone': random_phone(),
-            'insurance_carrier': random.choice(INSURERS),
-            'insurance_member_id': random_member_id(),
-            'insurance_group_number': random_group_number(),
-        }
-        rows.append(row)
-    return pd.DataFrame(rows)
-
-
-def generate_doctor_schedule() -> pd.DataFrame:
-    # Create slots for Mon-Fri next two weeks, 09:00-17:00
-    start_date = date.today() + timedelta(days=(7 - date.today().weekday()) % 7)  # next Monday or today if Monday
-    days = [start_date + timedelta(days=d) for d in range(0, 14) if (start_date + timedelta(days=d)).weekday() < 5]
-    slots = []
-    for doc in DOCTORS:
-        for d in days:
-            start_time = datetime(d.year, d.month, d.day, 9, 0)
-            end_time = datetime(d.year, d.month, d.day, 17, 0)
-            t = start_time
-            while t < end_time:
-                duration = 60 if (t.hour == 9) else 30  # First slot 60min for new patients, rest 30min
-                slots.append({
-                    'doctor_id': doc['doctor_id'],
-                    'doctor_name': doc['name'],
-                    'location': doc['location'],
-                    'date': t.date().isoformat(),
-                    'start_time': t.strftime('%H:%M'),
-                    'end_time': (t + timedelta(minutes=duration)).strftime('%H:%M'),
-                    'slot_type': 'new' if duration == 60 else 'returning',
-                    'available': True,
-                    'appointment_id': '',
-                    'patient_id': '',
-                })
-                t += timedelta(minutes=duration)
-    return pd.DataFrame(slots)
-
-
-def main():
-    BASE_DIR.mkdir(parents=True, exist_ok=True)
-    patients = generate_patients(50)
-    patients.to_csv(PATIENTS_CSV, index=False)
-
-    schedule = generate_doctor_schedule()
-    with pd.ExcelWriter(DOCTOR_XLSX, engine='openpyxl') as writer:
-        schedule.to_excel(writer, sheet_name='schedule', index=False)
-        pd.DataFrame(DOCTORS).to_excel(writer, sheet_name='doctors', index=False)
-
-    print(f"Wrote {PATIENTS_CSV}")
-    print(f"Wrote {DOCTOR_XLSX}")
+            'dob': np.datetime_as_string(dob, unit='D'),
+            'gender': _pick(rng, ['Male', 'Female', 'Other'], m),
+            'phone': _phones(rng, m),
+            'email': first_s.str.lower() + '.' + last_s.str.lower() + _digits(rng, 1, 99, m) + '@' + domain,
+            'address': _digits(rng, 100, 9999, m) + ' ' + _pick(rng, STREETS, m),
+            'city': _pick(rng, CITIES, m),
+            'state': _pick(rng, STATES, m),
+            'zip': _digits(rng, 10000, 99999, m),
+            'emergency_contact_name': pd.Series(_pick(rng, FIRST_NAMES, m)) + ' ' + _pick(rng, LAST_NAMES, m),
+            'emergency_contact_phone': _phones(rng, m),
+            'insurance_carrier': _pick(rng, INSURERS, m),
+            'insurance_member_id': _random_codes(rng, _ID_ALPHABET, 10, m),
+            'insurance_group_number': _random_codes(rng, _ID_ALPHABET[26:], 6, m),
+        })
+
+
+def generate_patients(n: int = 50, seed: Optional[int] = None) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.concat(list(iter_patient_chunks(n, rng)), ignore_index=True)
+
+
+def generate_doctors(n: int = 3, seed: Optional[int] = None) -> pd.DataFrame:
+    # The three demo doctors first, then synthetic ones with unique ids
+    rng = np.random.default_rng(seed)
+    fixed = pd.DataFrame(DOCTORS[:n])
+    extra = n - len(fixed)
+    if extra <= 0:
+        return fixed
+    synthetic = pd.DataFrame({
+        'doctor_id': 'D' + pd.Series(np.arange(len(DOCTORS) + 1, n + 1) * 100).astype(str),
+        'name': 'Dr. ' + pd.Series(_pick(rng, FIRST_NAMES, extra)) + ' ' + _pick(rng, LAST_NAMES, extra),
+        'location': pd.Series(_pick(rng, CITIES, extra)) + ' ' + _pick(rng, CLINIC_AREAS, extra),
+    })
+    return pd.concat([fixed, synthetic], ignore_index=True)
+
+
+def _schedule_days(start: date, days: int, weekends: bool) -> np.ndarray:
+    all_days = np.datetime64(start, 'D') + np.arange(days)
+    if not weekends:
+        # 1970-01-01 was a Thursday; weekday index with Monday = 0
+        weekday = (all_days.astype('int64') + 3) % 7
+        all_days = all_days[weekday < 5]
+    return all_days
+
+
+def _template_arrays(template: List[Tuple[int, str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    durations = np.array([d for d, _ in template])
+    starts = DAY_START + np.concatenate([[0], np.cumsum(durations)[:-1]])
+    return starts, starts + durations, np.array([t for _, t in template], dtype=object)
+
+
+def _hhmm(minutes: np.ndarray) -> np.ndarray:
+    hhmm = np.char.add(np.char.zfill((minutes // 60).astype(str), 2), ':')
+    return np.char.add(hhmm, np.char.zfill((minutes % 60).astype(str), 2)).astype(object)
+
+
+def iter_schedule_chunks(doctors: pd.DataFrame, days: np.ndarray, template: List[Tuple[int, str]],
+                         chunk_size: int = 100_000) -> Iterator[pd.DataFrame]:
+    starts, ends, types = _template_arrays(template)
+    start_s, end_s = _hhmm(starts), _hhmm(ends)
+    day_s = np.datetime_as_string(days, unit='D').astype(object)
+    per_doctor = len(days) * len(template)
+    doctors_per_chunk = max(1, chunk_size // max(per_doctor, 1))
+    for offset in range(0, len(doctors), doctors_per_chunk):
+        docs = doctors.iloc[offset:offset + doctors_per_chunk]
+        n = len(docs) * per_doctor
+        yield pd.DataFrame({
+            'doctor_id': np.repeat(docs['doctor_id'].to_numpy(dtype=object), per_doctor),
+            'doctor_name': np.repeat(docs['name'].to_numpy(dtype=object), per_doctor),
+            'location': np.repeat(docs['location'].to_numpy(dtype=object), per_doctor),
+            'date': np.tile(np.repeat(day_s, len(template)), len(docs)),
+            'start_time': np.tile(start_s, len(days) * len(docs)),
+            'end_time': np.tile(end_s, len(days) * len(docs)),
+            'slot_type': np.tile(types, len(days) * len(docs)),
+            'available': np.ones(n, dtype=bool),
+            'appointment_id': '',
+            'patient_id': '',
+        }, columns=SCHEDULE_COLUMNS)
+
+
+def generate_doctor_schedule(doctors: Optional[pd.DataFrame] = None, days: int = 14,
+                             template: str = 'standard', weekends: bool = False,
+                             start_date: Optional[date] = None) -> pd.DataFrame:
+    # Slots for Mon-Fri over the next `days` days, 09:00 onwards per template
+    doctors = pd.DataFrame(DOCTORS) if doctors is None else doctors
+    day_arr = _schedule_days(start_date or _next_monday(), days, weekends)
+    return pd.concat(list(iter_schedule_chunks(doctors, day_arr, SLOT_TEMPLATES[template])), ignore_index=True)
+
+
+def _write_frames(frames: Iterator[pd.DataFrame], path: Path, fmt: str) -> int:
+    rows = 0
+    if fmt == 'csv':
+        for i, frame in enumerate(frames):
+            frame.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            rows += len(frame)
+    elif fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        writer = None
+        try:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)  # one row group per chunk
+                rows += len(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+    return rows
+
+
+def write_dataset(config: GeneratorConfig, out_dir: Path, fmt: str = 'xlsx') -> List[Path]:
+    """Generate patients and a schedule into out_dir, streaming chunk by chunk where the format allows."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(config.seed)
+    doctors = generate_doctors(config.doctors, seed=config.seed)
+    days = _schedule_days(config.start_date or _next_monday(), config.days, config.weekends)
+    template = SLOT_TEMPLATES[config.template]
+    patients = iter_patient_chunks(config.patients, rng, config.chunk_size)
+    schedule = iter_schedule_chunks(doctors, days, template, config.chunk_size)
+    written = []
+
+    patients_path = out_dir / ('patients.parquet' if fmt == 'parquet' else 'patients.csv')
+    _write_frames(patients, patients_path, 'parquet' if fmt == 'parquet' else 'csv')
+    written.append(patients_path)
+
+    if fmt == 'xlsx':
+        # Excel cannot be appended to; fine for demo-sized schedules
+        path = out_dir / 'doctor_schedule.xlsx'
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            pd.concat(list(schedule), ignore_index=True).to_excel(writer, sheet_name='schedule', index=False)
+            doctors.to_excel(writer, sheet_name='doctors', index=False)
+    elif fmt == 'sqlite':
+        try:
+            from utils.storage import SQLiteBackend
+        except ImportError:
+            from src.utils.storage import SQLiteBackend
+        path = out_dir / 'scheduler.db'
+        backend = SQLiteBackend(path)
+        backend.save_schedule(pd.DataFrame(columns=SCHEDULE_COLUMNS))
+        for frame in schedule:
+            backend.append_schedule(frame)
+        backend.save_doctors(doctors)
+    else:
+        path = out_dir / f'doctor_schedule.{fmt}'
+        _write_frames(schedule, path, fmt)
+        doctors_path = out_dir / f'doctors.{fmt}'
+        _write_frames(iter([doctors]), doctors_path, fmt)
+        written.append(doctors_path)
+    written.append(path)
+    return written
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic patients and doctor schedules.")
+    parser.add_argument('--patients', type=int, default=50)
+    parser.add_argument('--doctors', type=int, default=3)
+    parser.add_argument('--days', type=int, default=14, help='calendar days of slots from next Monday')
+    parser.add_argument('--template', choices=sorted(SLOT_TEMPLATES), default='standard')
+    parser.add_argument('--weekends', action='store_true', help='also schedule Saturdays and Sundays')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'parquet', 'sqlite'], default='xlsx')
+    parser.add_argument('--out-dir', type=Path, default=BASE_DIR)
+    args = parser.parse_args(argv)
+
+    config = GeneratorConfig(
+        patients=args.patients, doctors=args.doctors, days=args.days, template=args.template,
+        weekends=args.weekends, seed=args.seed, chunk_size=args.chunk_size,
+    )
+    for path in write_dataset(config, args.out_dir, args.format):
+        print(f"Wrote {path}")
 
 
 if __name__ == '__main__':
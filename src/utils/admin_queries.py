@@ -0,0 +1,70 @@
+from __future__ import annotations
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from . import io_utils
+from .lazy import lazy_import
+from .storage import SLOT_SORTS, SlotFilter
+
+pd = lazy_import('pandas')
+
+PAGE_SIZE = 25
+
+
+@dataclass(frozen=True)
+class Page:
+    """One page of schedule rows and the cursor of the next page (None on the last one)."""
+    rows: pd.DataFrame
+    next_cursor: Optional[str]
+
+
+def encode_cursor(sort: str, descending: bool, key: Sequence[str]) -> str:
+    raw = json.dumps([sort, descending, [str(v) for v in key]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> List[str]:
+    try:
+        cursor_sort, cursor_descending, key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if (cursor_sort, cursor_descending) != (sort, descending) or len(key) != len(SLOT_SORTS[sort]):
+        raise ValueError(f"Cursor was issued for a different order than {sort!r}")
+    return key
+
+
+def page_slots(filters: SlotFilter = SlotFilter(), sort: str = 'time', descending: bool = False,
+               cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Page:
+    """One page of schedule rows matching ``filters`` in SLOT_SORTS[sort] order.
+
+    Filtering, ordering and the page cut happen in the storage backend, and
+    the cursor carries the last row's sort key rather than an offset, so a
+    page costs the same however deep it is and stays stable while bookings
+    come in.
+    """
+    if sort not in SLOT_SORTS:
+        raise ValueError(f"Unknown sort {sort!r}; expected one of {sorted(SLOT_SORTS)}")
+    after = decode_cursor(cursor, sort, descending) if cursor else None
+    # One extra row tells whether there is a next page
+    rows = io_utils.query_slots(filters, sort, descending, after, limit + 1)
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows.iloc[:limit]
+    return Page(rows, encode_cursor(sort, descending, rows.iloc[-1][list(SLOT_SORTS[sort])].tolist()))
+
+
+def summary(by: Sequence[str] = ('doctor_id',), filters: SlotFilter = SlotFilter()) -> pd.DataFrame:
+    """Slots, booked, free and utilization per ``by`` group (columns from storage.STATS_KEYS)."""
+    df = io_utils.slot_stats(by, filters)
+    df['free'] = df['slots'] - df['booked']
+    df['utilization'] = (df['booked'] / df['slots'].where(df['slots'] > 0)).fillna(0.0).round(3)
+    return df
+
+
+def totals() -> Dict[str, int]:
+    # Whole-schedule booked/free counts; kept by the backend, so this never scans the slots
+    counts = io_utils.booking_counts()
+    return {'slots': counts['slots'], 'booked': counts['booked'], 'free': counts['slots'] - counts['booked']}
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from . import io_utils
+from .records import Slot, from_minutes, now_minutes
+from .slot_store import SlotKey, SlotStore, get_slot_store
+
+
+def _split_live(since: int, until: int) -> int:
+    return io_utils.split_new_slots(' '.join(from_minutes(since)), ' '.join(from_minutes(until)))
+
+
+class Allocator:
+    """Slot allocation strategy: which free slot a request gets.
+
+    The base class is the original rule, the earliest matching slot.
+    prepare() may reshape capacity before a request is planned and returns
+    the store to plan against; choose() picks among the request's keys and
+    must not change the store.
+    """
+    name = 'earliest'
+
+    def prepare(self, store: SlotStore, doctors: List[Dict[str, str]], slot_types: Iterable[str]) -> SlotStore:
+        return store
+
+    def choose(self, store: SlotStore, keys: List[SlotKey]) -> Optional[Slot]:
+        return store.earliest(keys)
+
+
+class LeastLoaded(Allocator):
+    """Of the matching doctors' next free slots starting within ``max_delay``
+    minutes of the earliest one, the one whose doctor is least utilized.
+
+    Spreads bookings across the doctors at a location instead of filling one
+    calendar front to back, at the cost of at most ``max_delay`` extra wait.
+    """
+    name = 'least_loaded'
+
+    def __init__(self, max_delay: int = 1440):
+        self.max_delay = max_delay
+
+    def choose(self, store: SlotStore, keys: List[SlotKey]) -> Optional[Slot]:
+        heads = store.heads(keys)
+        if not heads:
+            return None
+        cutoff = min(s.start for s in heads) + self.max_delay
+        return min((s for s in heads if s.start <= cutoff),
+                   key=lambda s: (store.utilization(s.doctor_id), s.start))
+
+
+class SplitNewSlots(Allocator):
+    """Earliest slot, but 'new' slots still free close to their start go to returning patients.
+
+    When a returning patient would otherwise get a later slot than a free
+    'new' slot starting within ``horizon`` minutes, every free 'new' slot in
+    that window is split into two 30-minute 'returning' slots first. New
+    patients book further ahead, so such slots would most likely go unused;
+    the split is one bulk storage write per window rather than one per request.
+    """
+    name = 'split_new'
+
+    def __init__(self, horizon: int = 2 * 1440, split: Callable[[int, int], int] = _split_live,
+                 reload: Callable[[], SlotStore] = get_slot_store, clock: Callable[[], int] = now_minutes):
+        self.horizon = horizon
+        self._split = split
+        self._reload = reload
+        self._clock = clock
+
+    def prepare(self, store: SlotStore, doctors: List[Dict[str, str]], slot_types: Iterable[str]) -> SlotStore:
+        if list(slot_types) != ['returning']:
+            return store
+        now = self._clock()
+        # Slots that have started can neither be booked nor split
+        store.retire_before(now)
+        new = store.earliest(store.keys_for(doctors, ['new']))
+        if new is None or not now <= new.start < now + self.horizon:
+            return store
+        returning = store.earliest(store.keys_for(doctors, ['returning']))
+        if returning is not None and returning.start <= new.start:
+            return store
+        return self._reload() if self._split(now, now + self.horizon) else store
+
+
+STRATEGIES = {cls.name: cls for cls in (Allocator, LeastLoaded, SplitNewSlots)}
+
+_allocator: Optional[Allocator] = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator() -> Allocator:
+    # SCHEDULER_ALLOCATION picks the strategy by name; 'earliest' keeps the original behaviour
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                name = os.environ.get('SCHEDULER_ALLOCATION', 'earliest')
+                if name not in STRATEGIES:
+                    raise ValueError(f"Unknown allocation strategy: {name}")
+                _allocator = STRATEGIES[name]()
+    return _allocator
+
+
+def set_allocator(allocator: Optional[Allocator]) -> None:
+    global _allocator
+    with _allocator_lock:
+        _allocator = allocator
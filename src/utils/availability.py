@@ -0,0 +1,27 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional
+
+from .doctor_resolver import get_doctor_resolver
+from .slot_store import get_slot_store
+
+
+def search_availability(doctor: str = '', location: str = '', slot_types: Optional[Iterable[str]] = None,
+                        date_from: Optional[str] = None, date_to: Optional[str] = None,
+                        time_from: Optional[str] = None, time_to: Optional[str] = None,
+                        weekdays: Optional[Iterable[int]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    """Next free slots for free-text doctor/location queries plus the SlotStore.search filters.
+
+    An empty doctor means any doctor; the location narrows the doctors the
+    same way it does when booking.
+    """
+    store = get_slot_store()
+    doctor_ids = None
+    locations = None
+    if doctor or location:
+        matches = get_doctor_resolver().match(doctor, location)
+        doctor_ids = [d['doctor_id'] for d in matches]
+        locations = {d['location'] for d in matches}
+    slots = store.search(doctor_ids=doctor_ids, locations=locations, slot_types=slot_types,
+                         date_from=date_from, date_to=date_to, time_from=time_from, time_to=time_to,
+                         weekdays=weekdays, limit=limit)
+    return [s.to_dict() for s in slots]
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import csv
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from . import io_utils
+from .doctor_resolver import get_doctor_resolver
+from .allocation import get_allocator
+from .patient_index import get_patient_registry
+from .records import Appointment
+from .slot_store import get_slot_store, note_schedule_written, schedule_write
+from .snapshot import patient_key
+
+INSURANCE_FIELDS = ('carrier', 'member_id', 'group_number')
+
+
+def load_requests(path: Path) -> List[Dict[str, Any]]:
+    """Read booking requests from a .jsonl file (one object per line) or a .csv file."""
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        with open(path, newline='', encoding='utf-8') as fh:
+            return list(csv.DictReader(fh))
+    with open(path, encoding='utf-8') as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def _insurance(request: Dict[str, Any]) -> Dict[str, str]:
+    # Either nested under 'insurance' or flat carrier/member_id/group_number columns
+    nested = request.get('insurance')
+    source = nested if isinstance(nested, dict) else request
+    return {k: str(source.get(k) or '') for k in INSURANCE_FIELDS}
+
+
+def _name_parts(name: str) -> Dict[str, str]:
+    tokens = name.split()
+    return {'first_name': tokens[0], 'last_name': tokens[-1] if len(tokens) > 1 else ''}
+
+
+def _reserve(store, allocator, keys: Dict[int, Any], results: List[Dict[str, Any]], pending: List[int]) -> None:
+    # Plan against the local store, then claim in one transaction; anything lost to a
+    # concurrent booker is re-planned, and each loss removes a candidate, so this ends
+    while pending:
+        planned = []
+        for i in pending:
+            slot = allocator.choose(store, keys[i])
+            if slot is None:
+                results[i].update(status='no_slot', error='no available slot matches')
+                continue
+            appointment_id = str(uuid.uuid4())[:8]
+            store.mark_booked(slot.doctor_id, slot.date, slot.start_time,
+                              appointment_id, results[i]['patient_id'])
+            planned.append((i, slot, appointment_id))
+        if not planned:
+            break
+        with schedule_write():
+            try:
+                claimed = io_utils.reserve_slots([
+                    (slot.doctor_id, slot.date, slot.start_time, appointment_id, results[i]['patient_id'])
+                    for i, slot, appointment_id in planned
+                ])
+            except BaseException:
+                for _, slot, _ in planned:
+                    store.release(slot.doctor_id, slot.date, slot.start_time)
+                raise
+            if any(claimed):
+                # Every planned slot, claimed or lost, is already marked booked locally
+                note_schedule_written()
+        pending = []
+        for (i, slot, appointment_id), ok in zip(planned, claimed):
+            if ok:
+                results[i].update(status='booked', scheduled=Appointment(
+                    appointment_id, results[i]['patient_id'], slot).to_dict())
+            else:
+                # Someone else holds it; it stays marked booked locally
+                store.mark_booked(slot.doctor_id, slot.date, slot.start_time)
+                pending.append(i)
+
+
+def book_batch(requests: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Book many appointment requests at once.
+
+    Patients and doctors are resolved against the cached indexes and every
+    request gets the slot the allocation strategy picks (earliest by default)
+    among those left by the requests before it, so assignments never collide.
+    All claims go to the store in one write transaction and all export rows in
+    one journal append. Unknown patients are registered in one append once
+    their slots are claimed; one that appears again later in the batch books
+    a returning slot there. Returns one result per request, in order, with
+    ``status`` 'booked', 'invalid' or 'no_slot'.
+    """
+    registry = get_patient_registry()
+    resolver = get_doctor_resolver()
+    allocator = get_allocator()
+    store = get_slot_store()
+
+    results: List[Dict[str, Any]] = []
+    pending: List[int] = []
+    wanted: Dict[int, tuple] = {}
+    new: List[int] = []
+    seen = set()
+    for i, request in enumerate(requests):
+        name = str(request.get('name') or '').strip()
+        dob = str(request.get('dob') or '').strip()
+        result: Dict[str, Any] = {'index': i, 'name': name, 'dob': dob, 'insurance': _insurance(request)}
+        results.append(result)
+        if not name or not dob:
+            result.update(status='invalid', error='name and dob are required')
+            continue
+        parts = _name_parts(name)
+        patient_id = registry.lookup(parts['first_name'], parts['last_name'], dob)
+        result['patient_id'] = patient_id
+        if patient_id is None:
+            # Only the first visit of a patient new to us is a new-patient visit
+            key = patient_key(parts['first_name'], parts['last_name'], dob)
+            result['is_new_patient'] = key not in seen
+            seen.add(key)
+            new.append(i)
+        else:
+            result['is_new_patient'] = False
+        doctors = resolver.match(str(request.get('doctor') or ''), str(request.get('location') or ''))
+        wanted[i] = (doctors, ['new' if result['is_new_patient'] else 'returning'])
+        store = allocator.prepare(store, *wanted[i])
+        pending.append(i)
+    # Keys only after every prepare(), which may have replaced the store
+    keys = {i: store.keys_for(*wanted[i]) for i in pending}
+
+    if not new:
+        _reserve(store, allocator, keys, results, pending)
+    else:
+        errors: List[BaseException] = []
+
+        def claim(ids: List[str]) -> List[bool]:
+            for i, patient_id in zip(new, ids):
+                results[i]['patient_id'] = patient_id
+            try:
+                _reserve(store, allocator, keys, results, pending)
+            except BaseException as exc:
+                # Earlier rounds may have committed; keep their patients and raise after
+                errors.append(exc)
+            return [results[i].get('status') == 'booked' for i in new]
+
+        # New patients are registered only with a claimed slot, so later visits are recognized
+        ids = registry.register_many([
+            dict(_name_parts(results[i]['name']), dob=results[i]['dob'],
+                 insurance_carrier=results[i]['insurance']['carrier'],
+                 insurance_member_id=results[i]['insurance']['member_id'],
+                 insurance_group_number=results[i]['insurance']['group_number'])
+            for i in new], claim=claim)
+        for i, patient_id in zip(new, ids):
+            results[i]['patient_id'] = patient_id
+        if errors:
+            raise errors[0]
+
+    exports = [
+        {
+            'appointment_id': r['scheduled']['appointment_id'],
+            'patient_name': r['name'],
+            'dob': r['dob'],
+            'doctor_name': r['scheduled']['doctor_name'],
+            'location': r['scheduled']['location'],
+            'date': r['scheduled']['date'],
+            'start_time': r['scheduled']['start_time'],
+            'insurance_carrier': r['insurance']['carrier'],
+            'member_id': r['insurance']['member_id'],
+            'group_number': r['insurance']['group_number'],
+            'status': 'confirmed',
+        }
+        for r in results if r.get('status') == 'booked'
+    ]
+    if exports:
+        io_utils.write_appointment_export(exports)
+    return results
@@ -0,0 +1,35 @@
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class VersionedCache(Generic[T]):
+    """Process-wide value that is reloaded only when its source version changes.
+
+    Shared by every caller in the process (e.g. all Streamlit sessions), so a
+    file or store is parsed once per change rather than once per rerun.
+    """
+
+    def __init__(self, loader: Callable[[], T], version: Callable[[], Hashable]):
+        self._loader = loader
+        self._version_fn = version
+        self._value: Optional[T] = None
+        self._version: Any = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        version = self._version_fn()
+        if not self._loaded or version != self._version:
+            with self._lock:
+                if not self._loaded or version != self._version:
+                    self._value = self._loader()
+                    self._version = version
+                    self._loaded = True
+        return self._value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List
+
+from . import io_utils
+from .data_cache import VersionedCache
+
+_TITLE_RE = re.compile(r'^\s*dr\b\.?\s*', re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Minimum share of the query's trigrams a name/location must contain to match
+MIN_SCORE = 0.5
+# Candidates scoring within this of the best one are all returned
+TIE_TOLERANCE = 0.05
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class _TrigramIndex:
+    def __init__(self, texts: List[str]):
+        self._grams = [trigrams(t) for t in texts]
+        self._postings: Dict[str, List[int]] = {}
+        for i, grams in enumerate(self._grams):
+            for g in grams:
+                self._postings.setdefault(g, []).append(i)
+
+    def scores(self, query: str) -> Dict[int, float]:
+        # Query coverage, nudged by Dice similarity so exact matches outrank supersets
+        q = trigrams(query)
+        if not q:
+            return {}
+        common = Counter(i for g in q for i in self._postings.get(g, ()))
+        return {i: 0.8 * n / len(q) + 0.2 * 2 * n / (len(q) + len(self._grams[i])) for i, n in common.items()}
+
+
+class DoctorResolver:
+    """Ranks doctors against free-text doctor and location queries.
+
+    Character trigram indexes over doctor names and locations are built once
+    per doctors sheet, so typos like "Sharmaa" still match and a lookup only
+    touches the postings for the query's trigrams.
+    """
+
+    def __init__(self, doctors: Iterable[Dict[str, str]]):
+        self.doctors = [
+            {'doctor_id': str(d['doctor_id']), 'doctor_name': str(d['doctor_name']), 'location': str(d['location'])}
+            for d in doctors
+        ]
+        self._names = _TrigramIndex([_TITLE_RE.sub('', d['doctor_name']) for d in self.doctors])
+        self._locations = _TrigramIndex([d['location'] for d in self.doctors])
+
+    def rank(self, doctor: str = '', location: str = '') -> List[Dict[str, object]]:
+        doctor = _TITLE_RE.sub('', doctor or '').strip()
+        location = (location or '').strip()
+        if doctor:
+            name_scores = {i: s for i, s in self._names.scores(doctor).items() if s >= MIN_SCORE}
+        else:
+            name_scores = {i: 1.0 for i in range(len(self.doctors))}
+        loc_scores: Dict[int, float] = {}
+        if location:
+            all_loc = self._locations.scores(location)
+            loc_scores = {i: all_loc[i] for i in name_scores if all_loc.get(i, 0.0) >= MIN_SCORE}
+        if loc_scores:
+            # Only narrow by location when it matches at all, as the old matcher did
+            ranked = [(0.7 * name_scores[i] + 0.3 * s, i) for i, s in loc_scores.items()]
+        else:
+            ranked = [(s, i) for i, s in name_scores.items()]
+        ranked.sort(key=lambda r: (-r[0], r[1]))
+        return [dict(self.doctors[i], score=round(score, 4)) for score, i in ranked]
+
+    def match(self, doctor: str = '', location: str = '') -> List[Dict[str, object]]:
+        ranked = self.rank(doctor, location)
+        if not ranked:
+            return []
+        best = ranked[0]['score']
+        return [d for d in ranked if d['score'] >= best - TIE_TOLERANCE]
+
+
+def _load_resolver() -> DoctorResolver:
+    doctors = io_utils.load_doctors()
+    if doctors.empty:
+        # Older workbooks have no doctors sheet; fall back to the schedule itself
+        doctors = io_utils.load_schedule()[['doctor_id', 'doctor_name', 'location']].drop_duplicates()
+    else:
+        doctors = doctors.rename(columns={'name': 'doctor_name'})
+    return DoctorResolver(doctors.to_dict('records'))
+
+
+_resolver_cache: VersionedCache[DoctorResolver] = VersionedCache(_load_resolver, io_utils.directory_version)
+
+
+def get_doctor_resolver() -> DoctorResolver:
+    return _resolver_cache.get()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .lazy import lazy_import
+from .storage import file_lock
+
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+def encode_rows(rows: List[Dict[str, Any]]) -> str:
+    # One JSON object per line, as the journal stores them
+    return ''.join(json.dumps(row, default=str) + '\n' for row in rows)
+
+
+class ExportJournal:
+    """Append-only JSONL journal of appointment export rows.
+
+    append() only enqueues; a background writer appends batches to the
+    journal under a cross-process lock, retrying a failed batch until it is
+    written. compact() builds the Excel report from the journal on demand.
+    """
+
+    def __init__(self, path: Path, legacy_xlsx: Optional[Path] = None,
+                 batch_size: int = 256, flush_interval: float = 0.2,
+                 max_retry_delay: float = 5.0, exit_timeout: float = 10.0):
+        self.path = Path(path)
+        self.legacy_xlsx = Path(legacy_xlsx) if legacy_xlsx else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self.exit_timeout = exit_timeout
+        self._queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def append(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._queue.put(dict(row))
+        self._ensure_writer()
+
+    def flush(self) -> None:
+        self._ensure_writer()
+        self._queue.join()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        # Synchronous: earlier queued rows first, then all of ``rows`` in a single append
+        self.flush()
+        self._write(rows)
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._start_lock:
+            if self._writer is None:
+                # Drain whatever is still queued before the interpreter exits
+                atexit.register(self._drain)
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name='export-journal', daemon=True)
+                self._writer.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                # Let a burst of confirmations accumulate into one write
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            delay = self.flush_interval
+            # Rows stay queued (and flush() keeps waiting) until they are on disk
+            while True:
+                try:
+                    self._write(batch)
+                    break
+                except Exception:
+                    logger.exception("Export journal write of %d rows to %s failed; retrying in %.1fs",
+                                     len(batch), self.path, delay)
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _drain(self) -> None:
+        # Like flush(), but a journal that keeps failing must not hang interpreter exit
+        deadline = time.monotonic() + self.exit_timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self._queue.unfinished_tasks:
+            logger.error("Exiting with %d export rows not written to %s", self._queue.unfinished_tasks, self.path)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        lines = encode_rows(rows)
+        with file_lock(self.path):
+            if not self.path.exists():
+                lines = self._legacy_lines() + lines
+            with open(self.path, 'a', encoding='utf-8') as fh:
+                fh.write(lines)
+
+    def _legacy_lines(self) -> str:
+        # Carry rows from an existing export workbook into a new journal once
+        if self.legacy_xlsx is None or not self.legacy_xlsx.exists():
+            return ''
+        existing = pd.read_excel(self.legacy_xlsx, sheet_name='appointments')
+        existing = existing.astype(object).where(existing.notna(), '')
+        return encode_rows(existing.to_dict('records'))
+
+    def read_rows(self) -> List[Dict[str, Any]]:
+        self.flush()
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding='utf-8') as fh:
+            return [json.loads(line) for line in fh if line.strip()]
+
+    def compact(self, xlsx_path: Path) -> int:
+        rows = self.read_rows()
+        if not rows and self.legacy_xlsx is not None and self.legacy_xlsx.exists():
+            # Nothing journaled yet; the workbook is already the report
+            return len(pd.read_excel(self.legacy_xlsx, sheet_name='appointments'))
+        df = pd.DataFrame(rows)
+        if 'appointment_id' in df.columns:
+            # The journal is an event log; later rows for an appointment update its fields
+            df = df.groupby('appointment_id', sort=False).last().reset_index()
+        with pd.ExcelWriter(xlsx_path, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='appointments', index=False)
+        return len(df)
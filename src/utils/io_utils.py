@@ -1,16 +1,86 @@
 from __future__ import annotations
+import os
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-import pandas as pd
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 from email.message import EmailMessage
 
+from .storage import ScheduleBackend, ExcelBackend, SQLiteBackend, StorageBusyError, Reservation, SlotFilter
+from .export_journal import ExportJournal, encode_rows
+from .tracing import traced_io
+from .lazy import lazy_import
+
+pd = lazy_import('pandas')
+
 BASE_DIR = Path(__file__).resolve().parents[2]
-PATIENTS_CSV = BASE_DIR / 'patients.csv'
-DOCTOR_XLSX = BASE_DIR / 'doctor_schedule.xlsx'
-APPT_EXPORT_XLSX = BASE_DIR / 'appointments_export.xlsx'
+# Data files live in the repo root unless SCHEDULER_DATA_DIR points elsewhere
+DATA_DIR = Path(os.environ.get('SCHEDULER_DATA_DIR') or BASE_DIR)
+PATIENTS_CSV = DATA_DIR / 'patients.csv'
+DOCTOR_XLSX = DATA_DIR / 'doctor_schedule.xlsx'
+APPT_EXPORT_XLSX = DATA_DIR / 'appointments_export.xlsx'
+APPT_EXPORT_JOURNAL = DATA_DIR / 'appointments_export.jsonl'
 INTAKE_FORM = BASE_DIR / 'appointment_forms' / 'New Patient Intake Form.docx'
+SCHEDULE_DB = DATA_DIR / 'scheduler.db'
+
+# 'sqlite' keeps the live schedule in SCHEDULE_DB; 'excel' uses DOCTOR_XLSX directly
+STORAGE_BACKEND = os.environ.get('SCHEDULER_BACKEND', 'sqlite')
+
+_backend: Optional[ScheduleBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> ScheduleBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if STORAGE_BACKEND == 'excel':
+                    _backend = ExcelBackend(DOCTOR_XLSX)
+                elif STORAGE_BACKEND == 'sqlite':
+                    _backend = SQLiteBackend(SCHEDULE_DB, seed_xlsx=DOCTOR_XLSX)
+                else:
+                    raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+    return _backend
+
+
+def set_backend(backend: Optional[ScheduleBackend]) -> None:
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def use_data_dir(data_dir: Path, backend: Optional[str] = None) -> None:
+    # Repoint every data file (benchmarks, stress runs); call before anything is loaded
+    global DATA_DIR, PATIENTS_CSV, DOCTOR_XLSX, APPT_EXPORT_XLSX, APPT_EXPORT_JOURNAL, SCHEDULE_DB, STORAGE_BACKEND
+    DATA_DIR = Path(data_dir)
+    PATIENTS_CSV = DATA_DIR / 'patients.csv'
+    DOCTOR_XLSX = DATA_DIR / 'doctor_schedule.xlsx'
+    APPT_EXPORT_XLSX = DATA_DIR / 'appointments_export.xlsx'
+    APPT_EXPORT_JOURNAL = DATA_DIR / 'appointments_export.jsonl'
+    SCHEDULE_DB = DATA_DIR / 'scheduler.db'
+    if backend is not None:
+        STORAGE_BACKEND = backend
+    set_backend(None)
+
+
+_export_journal: Optional[ExportJournal] = None
+
+
+def get_export_journal() -> ExportJournal:
+    global _export_journal
+    if _export_journal is None or _export_journal.path != APPT_EXPORT_JOURNAL:
+        with _backend_lock:
+            if _export_journal is None or _export_journal.path != APPT_EXPORT_JOURNAL:
+                _export_journal = ExportJournal(APPT_EXPORT_JOURNAL, legacy_xlsx=APPT_EXPORT_XLSX)
+    return _export_journal
 
 
+def _schedule_file() -> Optional[Path]:
+    # Only the Excel store reads/rewrites a whole file per call
+    return DOCTOR_XLSX if STORAGE_BACKEND == 'excel' else None
+
+
+@traced_io('read', path=lambda: PATIENTS_CSV)
 def load_patients() -> pd.DataFrame:
     if not PATIENTS_CSV.exists():
         raise FileNotFoundError(f"Missing patients.csv at {PATIENTS_CSV}")
@@ -18,37 +88,118 @@ def load_patients() -> pd.DataFrame:
     return df
 
 
+@traced_io('read', path=_schedule_file)
 def load_schedule() -> pd.DataFrame:
-    if not DOCTOR_XLSX.exists():
-        raise FileNotFoundError(f"Missing doctor_schedule.xlsx at {DOCTOR_XLSX}")
-    df = pd.read_excel(DOCTOR_XLSX, sheet_name='schedule')
-    return df
+    return get_backend().load_schedule()
 
 
+@traced_io('write', path=_schedule_file)
 def save_schedule(df: pd.DataFrame) -> None:
-    # Preserve doctors sheet if present
-    doctors_df: Optional[pd.DataFrame] = None
-    if DOCTOR_XLSX.exists():
-        try:
-            doctors_df = pd.read_excel(DOCTOR_XLSX, sheet_name='doctors')
-        except Exception:
-            doctors_df = None
-    with pd.ExcelWriter(DOCTOR_XLSX, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='schedule', index=False)
-        if doctors_df is not None:
-            doctors_df.to_excel(writer, sheet_name='doctors', index=False)
+    get_backend().save_schedule(df)
+
+
+@traced_io('read', path=_schedule_file)
+def load_doctors() -> pd.DataFrame:
+    return get_backend().load_doctors()
+
+
+@traced_io('write', path=_schedule_file)
+def reserve_slot(doctor_id: str, date: str, start_time: str, appointment_id: str, patient_id: str) -> bool:
+    return get_backend().reserve_slot(doctor_id, date, start_time, appointment_id, patient_id)
+
+
+@traced_io('write', path=_schedule_file)
+def reserve_slots(reservations: List[Reservation]) -> List[bool]:
+    return get_backend().reserve_slots(reservations)
+
+
+@traced_io('write', path=_schedule_file)
+def cancel_slot(appointment_id: str) -> Optional[Dict[str, str]]:
+    return get_backend().cancel_slot(appointment_id)
+
+
+@traced_io('write', path=_schedule_file)
+def move_slot(appointment_id: str, doctor_id: str, date: str, start_time: str) -> Optional[Dict[str, str]]:
+    return get_backend().move_slot(appointment_id, doctor_id, date, start_time)
+
 
+@traced_io('write', path=_schedule_file)
+def split_new_slots(since: str, until: str) -> int:
+    return get_backend().split_new_slots(since, until)
 
+
+@traced_io('read')
+def schedule_version() -> int:
+    return get_backend().version()
+
+
+def last_schedule_write() -> Optional[Tuple[int, int]]:
+    return get_backend().last_write()
+
+
+@traced_io('read')
+def directory_version() -> int:
+    return get_backend().directory_version()
+
+
+@traced_io('read')
+def grid_version() -> str:
+    return get_backend().grid_version()
+
+
+@traced_io('read', path=_schedule_file)
+def load_bookings() -> pd.DataFrame:
+    return get_backend().load_bookings()
+
+
+@traced_io('read')
+def booking_counts() -> Dict[str, int]:
+    return get_backend().counts()
+
+
+@traced_io('read', path=_schedule_file)
+def query_slots(filters: SlotFilter, sort: str = 'time', descending: bool = False,
+                after: Optional[Sequence[str]] = None, limit: int = 50) -> pd.DataFrame:
+    return get_backend().query_slots(filters, sort, descending, after, limit)
+
+
+@traced_io('read', path=_schedule_file)
+def slot_stats(by: Sequence[str], filters: SlotFilter) -> pd.DataFrame:
+    return get_backend().slot_stats(by, filters)
+
+
+@traced_io('write', path=lambda: DOCTOR_XLSX)
+def import_schedule_from_excel(path: Optional[Path] = None) -> None:
+    get_backend().import_excel(Path(path or DOCTOR_XLSX))
+
+
+@traced_io('write', path=lambda: DOCTOR_XLSX)
+def export_schedule_to_excel(path: Optional[Path] = None) -> None:
+    get_backend().export_excel(Path(path or DOCTOR_XLSX))
+
+
+def _export_bytes(rows: List[Dict[str, Any]]) -> int:
+    return len(encode_rows(rows).encode('utf-8'))
+
+
+@traced_io('write', nbytes=_export_bytes)
 def append_appointment_export(rows: List[Dict[str, Any]]) -> None:
-    if APPT_EXPORT_XLSX.exists():
-        existing = pd.read_excel(APPT_EXPORT_XLSX, sheet_name='appointments')
-        new_df = pd.concat([existing, pd.DataFrame(rows)], ignore_index=True)
-    else:
-        new_df = pd.DataFrame(rows)
-    with pd.ExcelWriter(APPT_EXPORT_XLSX, engine='openpyxl') as writer:
-        new_df.to_excel(writer, sheet_name='appointments', index=False)
+    # Journaled in the background; see compact_appointment_export for the Excel report
+    get_export_journal().append(rows)
+
+
+@traced_io('write', nbytes=_export_bytes)
+def write_appointment_export(rows: List[Dict[str, Any]]) -> None:
+    # Durable before returning, in one journal append (bulk bookings)
+    get_export_journal().write(rows)
+
+
+@traced_io('write', path=lambda: APPT_EXPORT_XLSX)
+def compact_appointment_export(path: Optional[Path] = None) -> int:
+    return get_export_journal().compact(Path(path or APPT_EXPORT_XLSX))
 
 
+@traced_io('write')
 def simulate_send_email(to: str, subject: str, body: str, attachments: Optional[List[Path]] = None) -> None:
     msg = EmailMessage()
     msg['To'] = to
@@ -63,6 +214,7 @@ def simulate_send_email(to: str, subject: str, body: str, attachments: Optional[
     print("=======================")
 
 
+@traced_io('write')
 def simulate_send_sms(to: str, body: str) -> None:
     print("=== Simulated SMS ===")
     print(f"To: {to}\nBody: {body}")
@@ -0,0 +1,42 @@
+from __future__ import annotations
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+from typing import List
+
+_lock = threading.Lock()
+_deferred: List[ModuleType] = []
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return ``name`` as a module that is only executed on first attribute access.
+
+    Lets modules on the request path keep ``import pandas as pd``-style names
+    without paying for the import until a function actually uses it.
+    """
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ImportError(f"No module named {name!r}", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        _deferred.append(module)
+        return module
+
+
+def load_deferred() -> None:
+    """Execute every module handed out by lazy_import that has not been used yet.
+
+    LazyLoader before Python 3.12 can run a module twice when two threads touch
+    it first at the same moment, so servers call this once before serving.
+    """
+    with _lock:
+        while _deferred:
+            getattr(_deferred.pop(), '__spec__')
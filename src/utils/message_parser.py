@@ -0,0 +1,77 @@
+from __future__ import annotations
+import re
+from typing import Dict, List, Optional, Tuple
+
+# "Key: value" labels users type, mapped to the state field they fill
+FIELD_ALIASES: Dict[str, str] = {
+    'name': 'name',
+    'full name': 'name',
+    'dob': 'dob',
+    'date of birth': 'dob',
+    'dr': 'doctor',
+    'doctor': 'doctor',
+    'location': 'location',
+    'carrier': 'carrier',
+    'insurance carrier': 'carrier',
+    'member': 'member_id',
+    'member id': 'member_id',
+    'group': 'group_number',
+    'group number': 'group_number',
+    'date': 'date',
+    'new date': 'date',
+    'time': 'time',
+    'new time': 'time',
+}
+
+_MAX_LABEL_WORDS = max(len(k.split()) for k in FIELD_ALIASES)
+_SEPARATOR_RE = re.compile(r'[,;\n]')
+
+
+def _split_label(text: str) -> Tuple[str, Optional[str]]:
+    # The label is the last one to three words before a colon ("... my name:", "Member ID:")
+    pieces = text.rsplit(None, _MAX_LABEL_WORDS)
+    if len(pieces) > _MAX_LABEL_WORDS:
+        head, words = pieces[0], pieces[1:]
+    else:
+        head, words = '', pieces
+    lowered = [w.lower() for w in words]
+    for n in range(len(words), 0, -1):
+        target = FIELD_ALIASES.get(' '.join(lowered[-n:]))
+        if target:
+            return ' '.join([head] + words[:-n]), target
+    return text, None
+
+
+def parse_message(text: str) -> Dict[str, str]:
+    """Extract every known field from a message in one pass; the first value for a field wins.
+
+    The message is split once on separators (comma, semicolon, newline). In
+    each segment a colon preceded by a known label starts a field, whose value
+    runs to the next labelled colon; other colons (e.g. "10:30") stay in the value.
+    """
+    fields: Dict[str, str] = {}
+    if ':' not in text:
+        return fields
+    for segment in _SEPARATOR_RE.split(text):
+        parts = segment.split(':')
+        target: Optional[str] = None
+        value: List[str] = []
+        last = len(parts) - 1
+        for i, part in enumerate(parts):
+            prefix, label = _split_label(part) if i < last else (part, None)
+            if label is None:
+                value.append(part)
+                continue
+            if target is not None:
+                value.append(prefix)
+                _set_field(fields, target, value)
+            target, value = label, []
+        if target is not None:
+            _set_field(fields, target, value)
+    return fields
+
+
+def _set_field(fields: Dict[str, str], target: str, value: List[str]) -> None:
+    joined = ':'.join(value).strip()
+    if joined:
+        fields.setdefault(target, joined)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .io_utils import simulate_send_email, simulate_send_sms
+
+CHANNELS = ('email', 'sms')
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notification:
+    channel: str
+    to: str
+    body: str
+    subject: str = ''
+    attachments: Optional[List[Path]] = None
+    send_at: float = 0.0  # epoch seconds; 0 means as soon as possible
+    key: str = ''  # e.g. the appointment id the message belongs to
+    attempts: int = 0
+    # Called with True once delivered, or False once dropped after the last attempt
+    on_done: Optional[Callable[[bool], None]] = None
+
+
+class Transport:
+    """Delivers a batch of notifications for one channel; raise to retry."""
+
+    def send_batch(self, channel: str, batch: List[Notification]) -> None:
+        raise NotImplementedError
+
+
+class ConsoleTransport(Transport):
+    def send_batch(self, channel: str, batch: List[Notification]) -> None:
+        for n in batch:
+            if channel == 'email':
+                simulate_send_email(to=n.to, subject=n.subject, body=n.body, attachments=n.attachments)
+            else:
+                simulate_send_sms(n.to, n.body)
+
+
+class MemoryTransport(Transport):
+    """Local fake SMTP/SMS sink that records what was delivered.
+
+    ``fail_first`` makes the first N batches raise, to exercise retries.
+    """
+
+    def __init__(self, fail_first: int = 0):
+        self.sent: Dict[str, List[Notification]] = {c: [] for c in CHANNELS}
+        self.batches: List[int] = []
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+
+    def send_batch(self, channel: str, batch: List[Notification]) -> None:
+        with self._lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                raise ConnectionError("simulated transport failure")
+            self.sent[channel].extend(batch)
+            self.batches.append(len(batch))
+
+
+class NotificationDispatcher:
+    """Queue + asyncio worker pool that delivers notifications off the booking path.
+
+    submit() is thread-safe and returns immediately. Messages with a future
+    ``send_at`` wait on the event loop's timer; due messages go to a queue per
+    channel where workers pull them in batches. A failed batch is retried with
+    exponential backoff up to ``max_attempts``. Each message's ``on_done``
+    hook, if any, hears how it ended.
+    """
+
+    def __init__(self, transport: Optional[Transport] = None, workers: int = 4,
+                 batch_size: int = 50, batch_window: float = 0.05,
+                 max_attempts: int = 4, backoff: float = 0.5):
+        self.transport = transport or ConsoleTransport()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.failed: List[Notification] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._pending = 0  # due or retrying messages not yet delivered or dropped
+        self._idle = threading.Condition()
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            ready = threading.Event()
+            threading.Thread(target=self._run_loop, args=(ready,), name='notifications', daemon=True).start()
+            ready.wait()
+            atexit.register(self.flush, 5.0)
+
+    def _run_loop(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        for channel in CHANNELS:
+            self._queues[channel] = asyncio.Queue()
+            for _ in range(self.workers):
+                loop.create_task(self._worker(channel))
+        self._loop = loop
+        ready.set()
+        loop.run_forever()
+
+    def submit(self, notification: Notification) -> None:
+        if notification.channel not in CHANNELS:
+            raise ValueError(f"Unknown notification channel: {notification.channel}")
+        self.start()
+        self._loop.call_soon_threadsafe(self._schedule, notification)
+
+    def _schedule(self, notification: Notification) -> None:
+        delay = notification.send_at - time.time()
+        if delay > 0:
+            self._loop.call_later(delay, self._schedule, notification)
+            return
+        self._adjust_pending(1)
+        self._queues[notification.channel].put_nowait(notification)
+
+    def _adjust_pending(self, delta: int) -> None:
+        with self._idle:
+            self._pending += delta
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    async def _worker(self, channel: str) -> None:
+        queue = self._queues[channel]
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time())))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                # Transports may block (SMTP, HTTP); keep them off the event loop
+                await loop.run_in_executor(None, self.transport.send_batch, channel, batch)
+            except Exception:
+                dropped = []
+                for n in batch:
+                    n.attempts += 1
+                    if n.attempts < self.max_attempts:
+                        n.send_at = time.time() + self.backoff * 2 ** (n.attempts - 1)
+                        loop.call_later(n.send_at - time.time(), queue.put_nowait, n)
+                    else:
+                        dropped.append(n)
+                if dropped:
+                    self.failed.extend(dropped)
+                    await loop.run_in_executor(None, self._done, dropped, False)
+                    self._adjust_pending(-len(dropped))
+            else:
+                await loop.run_in_executor(None, self._done, batch, True)
+                self._adjust_pending(-len(batch))
+
+    def _done(self, batch: List[Notification], delivered: bool) -> None:
+        for n in batch:
+            if n.on_done is None:
+                continue
+            try:
+                n.on_done(delivered)
+            except Exception:
+                logger.exception("Notification completion hook failed for %s", n.key or n.to)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Wait until every message that is already due has been delivered or dropped
+        if self._loop is None:
+            return True
+        # Round-trip through the loop so submissions made before this call are counted
+        done = threading.Event()
+        self._loop.call_soon_threadsafe(done.set)
+        done.wait(timeout)
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> NotificationDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = NotificationDispatcher()
+    return _dispatcher
+
+
+def set_dispatcher(dispatcher: Optional[NotificationDispatcher]) -> None:
+    global _dispatcher
+    with _dispatcher_lock:
+        _dispatcher = dispatcher
@@ -0,0 +1,194 @@
+from __future__ import annotations
+import csv
+import io
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import io_utils
+from .lazy import lazy_import
+from .snapshot import (PATIENT_ID_PATTERN, Table, appended_state, file_state, patient_key, patients_snapshot,
+                       record_appended)
+from .storage import file_lock
+
+np = lazy_import('numpy')
+
+FIRST_PATIENT_ID = 1000
+# The snapshot is rebuilt once rows appended after it exceed this share of it (or 1 MB)
+REBUILD_TAIL_FRACTION = 0.1
+MIN_REBUILD_TAIL_BYTES = 1 << 20
+
+_patient_id = re.compile(PATIENT_ID_PATTERN)
+
+
+class PatientRegistry:
+    """Lookup and registration of patients by normalized (first, last, dob).
+
+    Lookups binary-search the memory-mapped patients snapshot (sorted on that
+    key), shared by every process, and then a small in-memory index of the
+    rows appended to the CSV since the snapshot was built. Appended rows are
+    read incrementally from the last offset while the file stays on the
+    snapshot's append chain, and re-read from the snapshot's end after any
+    other change. The snapshot is rebuilt only once that tail grows past a
+    fraction of it, so registering a patient never rewrites the file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._table: Optional[Table] = None
+        self._offset = 0
+        self._tail: Dict[bytes, str] = {}
+        self._tail_rows = 0
+        self._max_id: Optional[int] = None
+        self._seen: Optional[List[int]] = None
+        # Append chain the rows read so far belong to; None when the file was not on one
+        self._chain: Optional[str] = None
+
+    def _refresh(self) -> None:
+        try:
+            seen = file_state(self.path.stat())
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Missing patients.csv at {self.path}") from None
+        if seen == self._seen:
+            return
+        with self._lock:
+            if seen == self._seen:
+                return
+            max_tail = None
+            if self._table is not None:
+                max_tail = max(MIN_REBUILD_TAIL_BYTES, int(self._table.manifest['source_bytes'] * REBUILD_TAIL_FRACTION))
+            table = patients_snapshot(self.path, max_tail)
+            chain, state = appended_state(table)
+            on_chain = state == seen
+            # Rows already read are only still valid if the file has just grown along the same chain
+            if table is not self._table or not on_chain or chain != self._chain:
+                self._table = table
+                self._offset = table.manifest['source_bytes']
+                self._tail = {}
+                self._tail_rows = 0
+                self._max_id = table.manifest.get('max_id')
+            self._read_tail()
+            self._seen = seen
+            self._chain = chain if on_chain else None
+
+    def _read_tail(self) -> None:
+        with open(self.path, 'rb') as fh:
+            fh.seek(self._offset)
+            data = fh.read()
+        # Only complete lines; a partial one is picked up once its writer finishes
+        data = data[:data.rfind(b'\n') + 1]
+        if not data:
+            return
+        header = self._table.manifest['header']
+        for row in csv.reader(io.StringIO(data.decode('utf-8'))):
+            if not row:
+                continue
+            fields = dict(zip(header, row))
+            key = patient_key(fields.get('first_name', ''), fields.get('last_name', ''), fields.get('dob', ''))
+            # Keep the first record for duplicate identities
+            self._tail.setdefault(key, fields.get('patient_id', ''))
+            self._tail_rows += 1
+            self._note_id(fields.get('patient_id', ''))
+        self._offset += len(data)
+
+    def _note_id(self, patient_id: str) -> None:
+        match = _patient_id.match(patient_id)
+        if match and (self._max_id is None or int(match.group(1)) > self._max_id):
+            self._max_id = int(match.group(1))
+
+    def _find(self, key: bytes) -> Optional[str]:
+        keys = self._table['key']
+        # Longer than every stored key means no match (and searchsorted would truncate it)
+        if len(keys) and len(key) <= keys.itemsize and 'patient_id' in self._table:
+            i = int(np.searchsorted(keys, key))
+            if i < len(keys) and keys[i] == key:
+                return self._table['patient_id'][i].decode('utf-8')
+        return self._tail.get(key)
+
+    def lookup(self, first: str, last: str, dob: str) -> Optional[str]:
+        self._refresh()
+        return self._find(patient_key(first, last, dob))
+
+    def register(self, first: str, last: str, dob: str, claim: Optional[Callable[[str], bool]] = None,
+                 **fields: Any) -> Optional[str]:
+        """The patient id for (first, last, dob), registering the patient if unknown.
+
+        With ``claim`` (see register_many) an unknown patient is registered only
+        if ``claim(patient_id)`` returns True, and None is returned otherwise.
+        """
+        keep = None if claim is None else (lambda ids: [claim(ids[0])])
+        return self.register_many([dict(fields, first_name=first, last_name=last, dob=dob)], keep)[0]
+
+    def register_many(self, records: Iterable[Dict[str, Any]],
+                      claim: Optional[Callable[[List[str]], Iterable[bool]]] = None) -> List[Optional[str]]:
+        """Patient ids for ``records`` (CSV fields; first_name, last_name and dob at least).
+
+        Unknown patients get the next ``P<n>`` ids and are appended to the CSV
+        in one write. The append happens under the file's cross-process lock
+        after catching up with rows other workers appended, so ids stay unique
+        and an identity is never registered twice.
+
+        ``claim``, if given, is called with the ids (known or about to be
+        assigned) while the lock is held, and returns per record whether to
+        keep it, e.g. whether a slot was reserved under that id. Unknown
+        patients none of whose records are kept are not registered and get
+        None. Errors from ``claim`` propagate and register nobody.
+        """
+        records = [{k: '' if v is None else str(v) for k, v in r.items()} for r in records]
+        with file_lock(self.path), self._lock:
+            self._refresh()
+            ids: List[str] = []
+            keys: List[bytes] = []
+            pending: Dict[bytes, Dict[str, str]] = {}
+            next_id = max(self._max_id + 1 if self._max_id is not None else FIRST_PATIENT_ID, FIRST_PATIENT_ID)
+            for record in records:
+                key = patient_key(record.get('first_name', ''), record.get('last_name', ''), record.get('dob', ''))
+                patient_id = self._find(key) or pending.get(key, {}).get('patient_id')
+                if patient_id is None:
+                    patient_id = record['patient_id'] = f'P{next_id}'
+                    pending[key] = record
+                    next_id += 1
+                ids.append(patient_id)
+                keys.append(key)
+            if claim is not None:
+                kept = {key for key, keep in zip(keys, claim(list(ids))) if keep}
+                ids = [None if key in pending and key not in kept else patient_id for key, patient_id in zip(keys, ids)]
+                pending = {key: record for key, record in pending.items() if key in kept}
+            if pending:
+                out = io.StringIO()
+                writer = csv.writer(out, lineterminator='\n')
+                for record in pending.values():
+                    writer.writerow([record.get(col, '') for col in self._table.manifest['header']])
+                with open(self.path, 'a+b') as fh:
+                    fh.seek(0, 2)
+                    if fh.tell():
+                        fh.seek(-1, 2)
+                        if fh.read(1) != b'\n':
+                            fh.write(b'\n')
+                    fh.write(out.getvalue().encode('utf-8'))
+                if self._chain is not None:
+                    # Appended from the chain's latest state, so the new state extends it
+                    self._seen = file_state(self.path.stat())
+                    record_appended(self._table, self._chain, self._seen)
+                # Index our own rows the same way as anyone else's
+                self._read_tail()
+        return ids
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._table) + self._tail_rows
+
+
+_registries: Dict[Path, PatientRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_patient_registry(path: Optional[Path] = None) -> PatientRegistry:
+    path = Path(path or io_utils.PATIENTS_CSV)
+    registry = _registries.get(path)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(path, PatientRegistry(path))
+    return registry
@@ -1,11 +1,13 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 OUTPUT_PDF = BASE_DIR / 'Technical_Approach.pdf'
 
 def generate_technical_approach_pdf():
+    # reportlab is only needed here, so it is not imported with the package
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
     c = canvas.Canvas(str(OUTPUT_PDF), pagesize=letter)
     width, height = letter
 
@@ -0,0 +1,93 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date as _date, datetime
+from typing import Any, Dict, Tuple
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+_EPOCH_ORDINAL = _date(1970, 1, 1).toordinal()
+
+
+def to_minutes(date: str, time: str) -> int:
+    """'YYYY-MM-DD', 'HH:MM' -> integer minutes since 1970-01-01 00:00."""
+    date, time = str(date), str(time)
+    days = _date.fromisoformat(date[:10]).toordinal() - _EPOCH_ORDINAL
+    return days * 1440 + int(time[:2]) * 60 + int(time[3:5])
+
+
+def now_minutes() -> int:
+    # The current local time as minutes since the epoch, like the schedule's dates and times
+    now = datetime.now()
+    return to_minutes(now.date().isoformat(), now.strftime('%H:%M'))
+
+
+def from_minutes(minutes: int) -> Tuple[str, str]:
+    days, minute = divmod(int(minutes), 1440)
+    return _date.fromordinal(days + _EPOCH_ORDINAL).isoformat(), f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def minutes_array(dates: pd.Series, times: pd.Series) -> np.ndarray:
+    # Vectorized to_minutes for whole schedule columns
+    days = pd.to_datetime(dates.astype(str).str.slice(0, 10), format='%Y-%m-%d').to_numpy('datetime64[D]').astype(np.int64)
+    times = times.astype(str)
+    return (days * 1440 + times.str.slice(0, 2).astype(np.int64).to_numpy() * 60
+            + times.str.slice(3, 5).astype(np.int64).to_numpy()).astype(np.int32)
+
+
+@dataclass(frozen=True)
+class Slot:
+    """One schedule slot; times are minutes since the epoch."""
+    __slots__ = ('doctor_id', 'doctor_name', 'location', 'slot_type', 'start', 'end')
+    doctor_id: str
+    doctor_name: str
+    location: str
+    slot_type: str
+    start: int
+    end: int
+
+    @property
+    def date(self) -> str:
+        return from_minutes(self.start)[0]
+
+    @property
+    def start_time(self) -> str:
+        return from_minutes(self.start)[1]
+
+    @property
+    def end_time(self) -> str:
+        return from_minutes(self.end)[1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'doctor_id': self.doctor_id,
+            'doctor_name': self.doctor_name,
+            'location': self.location,
+            'date': self.date,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'slot_type': self.slot_type,
+        }
+
+
+@dataclass(frozen=True)
+class Appointment:
+    __slots__ = ('appointment_id', 'patient_id', 'slot')
+    appointment_id: str
+    patient_id: str
+    slot: Slot
+
+    def to_dict(self) -> Dict[str, Any]:
+        # The shape kept in conversation state as state['scheduled']
+        return {
+            'appointment_id': self.appointment_id,
+            'doctor_id': self.slot.doctor_id,
+            'doctor_name': self.slot.doctor_name,
+            'location': self.slot.location,
+            'date': self.slot.date,
+            'start_time': self.slot.start_time,
+            'end_time': self.slot.end_time,
+            'slot_type': self.slot.slot_type,
+        }
@@ -0,0 +1,168 @@
+from __future__ import annotations
+import heapq
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from . import io_utils
+from .notifications import Notification, NotificationDispatcher, get_dispatcher
+
+
+class ReminderScheduler:
+    """Persistent min-heap of future reminders backed by SQLite.
+
+    Reminders are stored in a ``reminders`` table, so pending ones are
+    reloaded after a restart. A single thread sleeps on a condition until the
+    earliest reminder is due (or an earlier one is added), waking at least
+    every ``poll_interval`` seconds to pick up reminders other workers stored,
+    then hands due ones to the notification dispatcher. Cancelling flips the
+    stored rows; the heap entries are skipped lazily when they come due.
+
+    A reminder is claimed by pushing its ``due_at`` ``lease`` seconds ahead
+    and is marked 'sent' (or 'failed') only when the dispatcher reports back,
+    so one lost to a crash comes due again and is retried.
+    """
+
+    def __init__(self, path: Path, dispatcher: Optional[NotificationDispatcher] = None,
+                 poll_interval: float = 2.0, lease: float = 300.0):
+        self.path = Path(path)
+        self._dispatcher = dispatcher
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._heap: List[Tuple[float, int]] = []
+        self._queued: Set[int] = set()
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._thread: Optional[threading.Thread] = None
+        self._last_id = 0
+
+    @property
+    def dispatcher(self) -> NotificationDispatcher:
+        return self._dispatcher or get_dispatcher()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS reminders (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    appointment_id TEXT NOT NULL,
+                    due_at REAL NOT NULL,
+                    channel TEXT NOT NULL,
+                    recipient TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending'
+                );
+                CREATE INDEX IF NOT EXISTS reminders_pending ON reminders (status, due_at);
+                CREATE INDEX IF NOT EXISTS reminders_appointment ON reminders (appointment_id);
+            """)
+            self._local.conn = conn
+        return conn
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._load_pending()
+            self._thread = threading.Thread(target=self._run, name='reminders', daemon=True)
+            self._thread.start()
+
+    def _load_pending(self) -> None:
+        # Pick up reminders persisted by earlier runs or other workers, and any whose lease ran out
+        rows = self._connect().execute(
+            "SELECT id, due_at FROM reminders WHERE status = 'pending' AND (id > ? OR due_at <= ?)",
+            (self._last_id, time.time())).fetchall()
+        for rid, due_at in rows:
+            if rid not in self._queued:
+                heapq.heappush(self._heap, (due_at, rid))
+                self._queued.add(rid)
+            self._last_id = max(self._last_id, rid)
+
+    def schedule(self, appointment_id: str, due_at: float, channel: str, recipient: str, body: str) -> int:
+        self.start()
+        rid = self._connect().execute(
+            'INSERT INTO reminders (appointment_id, due_at, channel, recipient, body) VALUES (?, ?, ?, ?, ?)',
+            (appointment_id, due_at, channel, recipient, body)).lastrowid
+        with self._cond:
+            heapq.heappush(self._heap, (due_at, rid))
+            self._queued.add(rid)
+            self._last_id = max(self._last_id, rid)
+            if self._heap[0][1] == rid:
+                # New earliest reminder: wake the thread to shorten its sleep
+                self._cond.notify()
+        return rid
+
+    def cancel(self, appointment_id: str) -> int:
+        return self._connect().execute(
+            "UPDATE reminders SET status = 'cancelled' WHERE appointment_id = ? AND status = 'pending'",
+            (appointment_id,)).rowcount
+
+    def pending(self, appointment_id: Optional[str] = None) -> int:
+        sql = "SELECT COUNT(*) FROM reminders WHERE status = 'pending'"
+        args: tuple = ()
+        if appointment_id is not None:
+            sql += ' AND appointment_id = ?'
+            args = (appointment_id,)
+        return self._connect().execute(sql, args).fetchone()[0]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                wait = self.poll_interval
+                if self._heap:
+                    wait = min(wait, self._heap[0][0] - time.time())
+                if wait > 0:
+                    self._cond.wait(wait)
+                self._load_pending()
+                due = []
+                while self._heap and self._heap[0][0] <= time.time():
+                    entry = heapq.heappop(self._heap)
+                    self._queued.discard(entry[1])
+                    due.append(entry)
+            for due_at, rid in due:
+                self._fire(rid, due_at)
+
+    def _fire(self, rid: int, due_at: float) -> None:
+        conn = self._connect()
+        # Claim the row with a lease; a cancelled reminder, or one another worker claimed, is skipped
+        claimed = conn.execute(
+            "UPDATE reminders SET due_at = ? WHERE id = ? AND status = 'pending' AND due_at = ?",
+            (time.time() + self.lease, rid, due_at)).rowcount
+        if not claimed:
+            return
+        appointment_id, channel, recipient, body = conn.execute(
+            'SELECT appointment_id, channel, recipient, body FROM reminders WHERE id = ?', (rid,)).fetchone()
+        self.dispatcher.submit(Notification(channel=channel, to=recipient, body=body, key=appointment_id,
+                                            on_done=lambda delivered: self._finish(rid, delivered)))
+
+    def _finish(self, rid: int, delivered: bool) -> None:
+        # Left alone if it was cancelled while in flight
+        self._connect().execute(
+            "UPDATE reminders SET status = ? WHERE id = ? AND status = 'pending'",
+            ('sent' if delivered else 'failed', rid))
+
+
+_scheduler: Optional[ReminderScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_reminder_scheduler() -> ReminderScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                scheduler = ReminderScheduler(io_utils.SCHEDULE_DB)
+                # Started right away so reminders persisted before a restart fire without a new booking
+                scheduler.start()
+                _scheduler = scheduler
+    return _scheduler
+
+
+def set_reminder_scheduler(scheduler: Optional[ReminderScheduler]) -> None:
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
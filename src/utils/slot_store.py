@@ -0,0 +1,363 @@
+from __future__ import annotations
+import bisect
+import heapq
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from . import io_utils
+from .lazy import lazy_import
+from .records import Slot, minutes_array, now_minutes, to_minutes
+from .snapshot import Table, schedule_columns, schedule_snapshot
+from .storage import BOOKING_COLUMNS, SCHEDULE_COLUMNS
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+SlotKey = Tuple[int, int, int]  # (doctor, location, slot_type) codes
+
+
+class SlotStore:
+    """The schedule as columnar arrays, with free slots per (doctor, location, slot_type).
+
+    Rows are sorted by (doctor, start minute), so within one key row order is
+    time order: each key keeps its row indices plus a cursor past the slots
+    already booked, and a small heap for slots released behind the cursor.
+    The grid columns are those of snapshot.schedule_columns.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = ()):
+        self._from_frame(pd.DataFrame(list(rows), columns=SCHEDULE_COLUMNS))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'SlotStore':
+        store = cls.__new__(cls)
+        store._from_frame(df)
+        return store
+
+    @classmethod
+    def from_snapshot(cls, table: Table, bookings: pd.DataFrame) -> 'SlotStore':
+        """Map the slot grid from a schedule snapshot and apply the current ``bookings``.
+
+        The grid columns stay memory-mapped, shared with every other process
+        using the same snapshot; only availability and the indexes are private.
+        """
+        store = cls.__new__(cls)
+        store._build(table, bookings)
+        return store
+
+    def _from_frame(self, df: pd.DataFrame) -> None:
+        self._build(schedule_columns(df), df.loc[~df['available'].fillna(True).astype(bool).to_numpy(), BOOKING_COLUMNS])
+
+    def _build(self, columns: Mapping[str, np.ndarray], bookings: pd.DataFrame) -> None:
+        self._lock = threading.RLock()
+        self._doctor_ids: List[str] = columns['doctor_ids'].tolist()
+        self._names: List[str] = columns['names'].tolist()
+        self._locations: List[str] = columns['locations'].tolist()
+        self._slot_types: List[str] = columns['slot_types'].tolist()
+        self._doctor = columns['doctor']
+        self._name = columns['name']
+        self._location = columns['location']
+        self._slot_type = columns['slot_type']
+        self._start = columns['start']
+        self._end = columns['end']
+        # Lookup key for (doctor, start); sorted because the rows are
+        self._ids = columns['ids']
+        # bytearray/array give plain ints on indexing, which keeps the per-key scan cheap
+        self._available = bytearray(b'\x01') * len(self._start)
+        self._start_at = array('i', np.asarray(self._start).tobytes())
+        self._doctor_codes = {d: i for i, d in enumerate(self._doctor_ids)}
+        self._location_codes = {loc: i for i, loc in enumerate(self._locations)}
+        self._type_codes = {t: i for i, t in enumerate(self._slot_types)}
+
+        # Only booked slots carry appointment/patient ids
+        self._bookings: Dict[int, Tuple[str, str]] = {}
+        rows, found = self._rows_for(bookings['doctor_id'], bookings['date'], bookings['start_time'])
+        self.available_mask()[rows[found]] = False
+        for i, appointment_id, patient_id in zip(rows[found].tolist(),
+                                                 bookings['appointment_id'].fillna('').astype(str)[found],
+                                                 bookings['patient_id'].fillna('').astype(str)[found]):
+            self._bookings[i] = (appointment_id, patient_id)
+
+        group = (self._doctor.astype(np.int64) * len(self._locations) + self._location) * len(self._slot_types) + self._slot_type
+        by_group = np.argsort(group, kind='stable')
+        bounds = np.flatnonzero(np.diff(group[by_group])) + 1
+        # Per key: [row indices, cursor, heap of released rows behind the cursor]
+        self._groups: Dict[SlotKey, list] = {}
+        for rows in np.split(by_group, bounds) if len(by_group) else []:
+            i = rows[0]
+            self._groups[(int(self._doctor[i]), int(self._location[i]), int(self._slot_type[i]))] = [
+                array('i', rows.astype(np.int32).tobytes()), 0, []]
+
+        # Free-slot count per (doctor, day): a day bitmap for search() to skip full days.
+        # _day_rows[d, k]:_day_rows[d, k + 1] are doctor d's rows on day _day0 + k.
+        day = self._start // 1440
+        self._day0 = int(day.min()) if len(day) else 0
+        n_days = int(day.max()) - self._day0 + 1 if len(day) else 0
+        self._day_free = np.zeros((len(self._doctor_ids), n_days), dtype=np.int32)
+        np.add.at(self._day_free, (self._doctor, day - self._day0), self.available_mask())
+        bounds = ((np.arange(len(self._doctor_ids), dtype=np.int64)[:, None] << 32)
+                  | ((self._day0 + np.arange(n_days + 1, dtype=np.int64)) * 1440)[None, :])
+        self._day_rows = np.searchsorted(self._ids, bounds).astype(np.int64)
+
+        # Utilization counters per doctor, in minutes, kept current by every booking and release
+        n_doctors = len(self._doctor_ids)
+        duration = (np.asarray(self._end) - np.asarray(self._start)).astype(np.int64)
+        self._total_minutes: List[int] = np.bincount(self._doctor, weights=duration, minlength=n_doctors).astype(np.int64).tolist()
+        self._booked_minutes: List[int] = np.bincount(self._doctor, weights=duration * ~self.available_mask(),
+                                                      minlength=n_doctors).astype(np.int64).tolist()
+        # Per doctor, the first row not yet retired (see retire_before)
+        self._retired: List[int] = np.searchsorted(self._ids, np.arange(n_doctors, dtype=np.int64) << 32).tolist()
+        self._retired_until = 0
+
+    def __len__(self) -> int:
+        return len(self._start)
+
+    def available_mask(self) -> np.ndarray:
+        # Zero-copy boolean view of availability, in row order
+        return np.frombuffer(self._available, dtype=np.bool_)
+
+    def keys_for(self, doctors: Iterable[Dict[str, str]], slot_types: Iterable[str]) -> List[SlotKey]:
+        keys = []
+        slot_types = list(slot_types)
+        for d in doctors:
+            doctor = self._doctor_codes.get(str(d['doctor_id']))
+            location = self._location_codes.get(str(d['location']))
+            if doctor is None or location is None:
+                continue
+            keys.extend((doctor, location, self._type_codes[t]) for t in slot_types if t in self._type_codes)
+        return keys
+
+    def _key(self, i: int) -> SlotKey:
+        return int(self._doctor[i]), int(self._location[i]), int(self._slot_type[i])
+
+    def _peek(self, key: SlotKey) -> Optional[int]:
+        group = self._groups.get(key)
+        if group is None:
+            return None
+        rows, cursor, released = group
+        available = self._available
+        while cursor < len(rows) and not available[rows[cursor]]:
+            cursor += 1
+        group[1] = cursor
+        best = rows[cursor] if cursor < len(rows) else None
+        while released and not available[released[0]]:
+            heapq.heappop(released)
+        if released and (best is None or released[0] < best):
+            best = released[0]
+        return best
+
+    def slot(self, i: int) -> Slot:
+        return Slot(
+            doctor_id=self._doctor_ids[self._doctor[i]],
+            doctor_name=self._names[self._name[i]],
+            location=self._locations[self._location[i]],
+            slot_type=self._slot_types[self._slot_type[i]],
+            start=int(self._start[i]),
+            end=int(self._end[i]),
+        )
+
+    def earliest(self, keys: Iterable[SlotKey]) -> Optional[Slot]:
+        best: Optional[int] = None
+        with self._lock:
+            for key in keys:
+                i = self._peek(key)
+                if i is not None and (best is None or self._start_at[i] < self._start_at[best]):
+                    best = i
+            return self.slot(best) if best is not None else None
+
+    def _find(self, doctor_id: str, date: str, start_time: str) -> Optional[int]:
+        doctor = self._doctor_codes.get(str(doctor_id))
+        if doctor is None:
+            return None
+        target = (doctor << 32) | to_minutes(date, start_time)
+        i = int(np.searchsorted(self._ids, target))
+        return i if i < len(self._ids) and self._ids[i] == target else None
+
+    def _rows_for(self, doctor_ids: pd.Series, dates: pd.Series, start_times: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        # Vectorized _find: the row of each (doctor, date, start) and whether it exists
+        doctor = doctor_ids.astype(str).map(self._doctor_codes).fillna(-1).to_numpy(np.int64)
+        target = (doctor << 32) | minutes_array(dates, start_times).astype(np.int64)
+        if not len(self._ids):
+            return np.zeros(len(target), dtype=np.int64), np.zeros(len(target), dtype=bool)
+        rows = np.minimum(np.searchsorted(self._ids, target), len(self._ids) - 1)
+        return rows, (doctor >= 0) & (self._ids[rows] == target)
+
+    def _day_cell(self, i: int) -> Tuple[int, int]:
+        return int(self._doctor[i]), self._start_at[i] // 1440 - self._day0
+
+    def _minutes(self, i: int) -> int:
+        return int(self._end[i]) - self._start_at[i]
+
+    def mark_booked(self, doctor_id: str, date: str, start_time: str,
+                    appointment_id: str = '', patient_id: str = '') -> None:
+        with self._lock:
+            i = self._find(doctor_id, date, start_time)
+            if i is None:
+                return
+            if self._available[i]:
+                self._available[i] = 0
+                doctor, day = self._day_cell(i)
+                self._day_free[doctor, day] -= 1
+                self._booked_minutes[doctor] += self._minutes(i)
+            self._bookings[i] = (appointment_id, patient_id)
+
+    def release(self, doctor_id: str, date: str, start_time: str) -> None:
+        with self._lock:
+            i = self._find(doctor_id, date, start_time)
+            if i is None or self._available[i] or i < self._retired[self._doctor[i]]:
+                return
+            self._available[i] = 1
+            doctor, day = self._day_cell(i)
+            self._day_free[doctor, day] += 1
+            self._booked_minutes[doctor] -= self._minutes(i)
+            self._bookings.pop(i, None)
+            rows, cursor, released = self._groups[self._key(i)]
+            if bisect.bisect_left(rows, i) < cursor:
+                # The cursor is already past it; track it separately
+                heapq.heappush(released, i)
+
+    def utilization(self, doctor_id: str) -> float:
+        """Share of the doctor's (unretired) slot minutes that are booked; O(1)."""
+        doctor = self._doctor_codes.get(str(doctor_id))
+        if doctor is None or not self._total_minutes[doctor]:
+            return 0.0
+        return self._booked_minutes[doctor] / self._total_minutes[doctor]
+
+    def heads(self, keys: Iterable[SlotKey]) -> List[Slot]:
+        # The earliest free slot of each key, in key order
+        with self._lock:
+            return [self.slot(i) for i in map(self._peek, keys) if i is not None]
+
+    def retire_before(self, minute: int) -> None:
+        """Take slots starting before ``minute`` (minutes since the epoch) out of play.
+
+        Free ones can no longer be booked, and none of them count toward
+        utilization any more, so it reflects the calendar still ahead.
+        """
+        minute = int(minute)
+        with self._lock:
+            if minute <= self._retired_until:
+                return
+            self._retired_until = minute
+            ends = np.searchsorted(self._ids, (np.arange(len(self._doctor_ids), dtype=np.int64) << 32) | minute)
+            for doctor in np.flatnonzero(ends > np.asarray(self._retired, dtype=np.int64)).tolist():
+                end = int(ends[doctor])
+                for i in range(self._retired[doctor], end):
+                    minutes = self._minutes(i)
+                    if self._available[i]:
+                        self._available[i] = 0
+                        self._day_free[self._day_cell(i)] -= 1
+                    else:
+                        self._booked_minutes[doctor] -= minutes
+                    self._total_minutes[doctor] -= minutes
+                self._retired[doctor] = end
+
+    def search(self, doctor_ids: Optional[Iterable[str]] = None, locations: Optional[Iterable[str]] = None,
+               slot_types: Optional[Iterable[str]] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, time_from: Optional[str] = None, time_to: Optional[str] = None,
+               weekdays: Optional[Iterable[int]] = None, limit: int = 10) -> List[Slot]:
+        """The earliest ``limit`` free slots matching every given filter.
+
+        Dates are inclusive 'YYYY-MM-DD'; the time window is [time_from, time_to)
+        on the slot start; weekdays are 0 (Monday) to 6. Days are visited in
+        order and only doctors with a free slot that day are looked at.
+        """
+        if doctor_ids is None:
+            doctors = np.arange(len(self._doctor_ids))
+        else:
+            doctors = np.array(sorted({self._doctor_codes[d] for d in map(str, doctor_ids) if d in self._doctor_codes}),
+                               dtype=np.int64)
+        location_codes = None if locations is None else [self._location_codes[loc] for loc in locations if loc in self._location_codes]
+        type_codes = None if slot_types is None else [self._type_codes[t] for t in slot_types if t in self._type_codes]
+        first = 0 if date_from is None else to_minutes(date_from, '00:00') // 1440 - self._day0
+        last = self._day_free.shape[1] - 1 if date_to is None else to_minutes(date_to, '00:00') // 1440 - self._day0
+        first, last = max(first, 0), min(last, self._day_free.shape[1] - 1)
+        window = (0 if time_from is None else to_minutes('1970-01-01', time_from),
+                  1440 if time_to is None else to_minutes('1970-01-01', time_to))
+        weekdays = None if weekdays is None else set(weekdays)
+        if not len(doctors) or location_codes == [] or type_codes == [] or first > last:
+            return []
+
+        found: List[int] = []
+        with self._lock:
+            available = self.available_mask()
+            free = self._day_free[doctors, first:last + 1]
+            for k in np.flatnonzero(free.any(axis=0)):
+                day = self._day0 + first + int(k)
+                if weekdays is not None and (day + 3) % 7 not in weekdays:  # 1970-01-01 was a Thursday
+                    continue
+                cell = first + int(k)
+                busy = doctors[free[:, k] > 0]
+                lo = self._day_rows[busy, cell]
+                counts = self._day_rows[busy, cell + 1] - lo
+                # Concatenated row ranges of every doctor with a free slot that day
+                rows = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                minute = self._start[rows] - day * 1440
+                mask = available[rows] & (minute >= window[0]) & (minute < window[1])
+                if location_codes is not None:
+                    mask &= np.isin(self._location[rows], location_codes)
+                if type_codes is not None:
+                    mask &= np.isin(self._slot_type[rows], type_codes)
+                rows = rows[mask]
+                found.extend(rows[np.argsort(self._start[rows], kind='stable')][:limit - len(found)].tolist())
+                if len(found) >= limit:
+                    break
+            return [self.slot(i) for i in found]
+
+
+_store: Optional[SlotStore] = None
+_store_version: Optional[int] = None
+# Our own writes not yet chained onto _store_version: version before -> version after
+_own_writes: Dict[int, int] = {}
+_store_lock = threading.Lock()
+# Held across each of our own writes, from the storage call until it is noted
+_write_lock = threading.Lock()
+
+
+def get_slot_store() -> SlotStore:
+    global _store, _store_version
+    version = io_utils.schedule_version()
+    if _store is None or version != _store_version:
+        with _write_lock, _store_lock:
+            # With none of our writes in flight, a version we haven't reached is someone else's
+            version = io_utils.schedule_version()
+            if _store is None or version != _store_version:
+                _store = SlotStore.from_snapshot(schedule_snapshot(), io_utils.load_bookings())
+                _store_version = version
+                _own_writes.clear()
+    # Slots that have started are no longer bookable or part of utilization; cheap unless the minute advanced
+    _store.retire_before(now_minutes())
+    return _store
+
+
+@contextmanager
+def schedule_write() -> Iterator[None]:
+    """Wrap a schedule write that the caller applies to the store and then notes.
+
+    Our writes go one at a time; the storage serializes them anyway, and this
+    way get_slot_store never mistakes one that is not noted yet for a foreign
+    write and rebuilds.
+    """
+    with _write_lock:
+        yield
+
+
+def note_schedule_written() -> None:
+    # Our own writes are already applied incrementally; skip the rebuild they would trigger.
+    # The version only advances through an unbroken run of them: any other write in between
+    # (e.g. another process's cancellation) leaves it behind, so the next get_slot_store rebuilds.
+    global _store_version
+    written = io_utils.last_schedule_write()
+    if written is None:
+        return
+    with _store_lock:
+        if _store is None or _store_version is None:
+            return
+        before, after = written
+        _own_writes[before] = after
+        while _store_version in _own_writes:
+            _store_version = _own_writes.pop(_store_version)
+        for stale in [v for v in _own_writes if v < _store_version]:
+            del _own_writes[stale]
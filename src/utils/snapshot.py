@@ -0,0 +1,295 @@
+from __future__ import annotations
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import io_utils
+from .lazy import lazy_import
+from .records import minutes_array
+from .storage import file_lock
+from .tracing import record
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# <data dir>/snapshots/<table>/CURRENT names the live version directory next to it
+SNAPSHOT_DIRNAME = 'snapshots'
+KEY_SEPARATOR = '\x1f'
+PATIENT_ID_PATTERN = r'^P(\d+)$'
+# Bytes at the end of a patients snapshot's source compared first, as a cheap check before the full digest
+FINGERPRINT_BYTES = 4096
+# Sidecar next to CURRENT recording the latest known append-only state of the patients CSV
+APPENDED_FILENAME = 'APPENDED'
+
+
+class Table:
+    """One snapshot version: a manifest plus one read-only memory-mapped .npy file per column.
+
+    Pages are shared through the OS page cache, so every process mapping the
+    same version pays for the data once.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / 'manifest.json').read_text(encoding='utf-8'))
+        self._columns = {name: np.load(self.path / f'{name}.npy', mmap_mode='r')
+                         for name in self.manifest['columns']}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __len__(self) -> int:
+        return self.manifest['rows']
+
+
+_tables: Dict[Path, Table] = {}
+_tables_lock = threading.Lock()
+
+
+def _open(root: Path, current: Callable[[Table], bool]) -> Optional[Table]:
+    try:
+        table = Table(root / (root / 'CURRENT').read_text(encoding='utf-8').strip())
+    except FileNotFoundError:
+        # No snapshot yet, or the version was pruned between reading CURRENT and mapping it
+        return None
+    return table if current(table) else None
+
+
+def _publish(root: Path, columns: Dict[str, np.ndarray], meta: Dict[str, object]) -> Table:
+    # Write into a private directory, rename it into place, then swap CURRENT;
+    # readers only ever see complete versions
+    name = f'v{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+    tmp = root / f'.{name}.tmp'
+    tmp.mkdir()
+    for col, values in columns.items():
+        np.save(tmp / f'{col}.npy', np.ascontiguousarray(values))
+    rows = len(next(iter(columns.values()))) if columns else 0
+    manifest = dict(meta, rows=rows, columns=list(columns))
+    (tmp / 'manifest.json').write_text(json.dumps(manifest), encoding='utf-8')
+    os.replace(tmp, root / name)
+    pointer = root / f'.CURRENT.{name}'
+    pointer.write_text(name, encoding='utf-8')
+    os.replace(pointer, root / 'CURRENT')
+
+    # Keep the previous version for processes still mapping it; on POSIX older
+    # mappings stay valid after their files are removed
+    versions = sorted(p.name for p in root.iterdir() if p.is_dir() and p.name.startswith('v'))
+    for old in versions[:-2]:
+        shutil.rmtree(root / old, ignore_errors=True)
+    return Table(root / name)
+
+
+def open_snapshot(root: Path, current: Callable[[Table], bool],
+                  build: Callable[[], Tuple[Dict[str, np.ndarray], Dict[str, object]]]) -> Table:
+    """The snapshot under ``root``, mapping or building it as needed.
+
+    ``current`` says whether a version still reflects the source data (its
+    manifest holds whatever ``build`` recorded about the source); when it does
+    not, the first process to notice rebuilds under a file lock and the rest
+    map the new version.
+    """
+    root = Path(root)
+    table = _tables.get(root)
+    if table is not None and current(table):
+        return table
+    with _tables_lock:
+        table = _tables.get(root)
+        if table is None or not current(table):
+            table = _open(root, current)
+            if table is None:
+                root.mkdir(parents=True, exist_ok=True)
+                with file_lock(root / 'CURRENT'):
+                    table = _open(root, current)
+                    if table is None:
+                        start = time.perf_counter_ns()
+                        columns, meta = build()
+                        table = _publish(root, columns, meta)
+                        record(f'io.snapshot_build.{root.name}', 'io', time.perf_counter_ns() - start,
+                               rows_written=len(table))
+            _tables[root] = table
+    return table
+
+
+def _utf8(values: pd.Series) -> np.ndarray:
+    # Fixed-width UTF-8 bytes: compact, mappable and searchsorted-able
+    if values.empty:
+        return np.zeros(0, dtype='S1')
+    return values.str.encode('utf-8').to_numpy(dtype='S')
+
+
+def patient_key(first: str, last: str, dob: str) -> bytes:
+    return KEY_SEPARATOR.join((str(first).strip().lower(), str(last).strip().lower(),
+                               str(dob).strip())).encode('utf-8')
+
+
+def _fingerprint(data: bytes) -> str:
+    return hashlib.sha1(data[-FINGERPRINT_BYTES:]).hexdigest()
+
+
+def covered_fingerprint(path: Path, size: int) -> str:
+    # Fingerprint of the first ``size`` bytes, from their tail only
+    with open(path, 'rb') as fh:
+        fh.seek(max(size - FINGERPRINT_BYTES, 0))
+        return _fingerprint(fh.read(min(size, FINGERPRINT_BYTES)))
+
+
+def prefix_digest(path: Path, size: int) -> str:
+    # Digest of the whole first ``size`` bytes
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        while size > 0:
+            chunk = fh.read(min(size, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            size -= len(chunk)
+    return digest.hexdigest()
+
+
+def file_state(stat: os.stat_result) -> List[int]:
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def appended_state(table: Table) -> Tuple[str, Optional[List[int]]]:
+    """The append chain of a patients snapshot: (chain id, latest file state).
+
+    Every state on a chain is the previous one plus appended rows, and its
+    first ``source_bytes`` are the snapshot's source. A chain starts at the
+    build (or at a full re-check of the covered bytes) and is extended by
+    registrations appending from its latest state.
+    """
+    try:
+        record = json.loads((table.path.parent / APPENDED_FILENAME).read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        record = None
+    if record and record.get('version') == table.path.name:
+        return record['chain'], record['state']
+    return table.path.name, table.manifest.get('source_state')
+
+
+def record_appended(table: Table, chain: str, state: List[int]) -> None:
+    root = table.path.parent
+    tmp = root / f'.{APPENDED_FILENAME}.{uuid.uuid4().hex[:8]}'
+    tmp.write_text(json.dumps({'version': table.path.name, 'chain': chain, 'state': state}), encoding='utf-8')
+    os.replace(tmp, root / APPENDED_FILENAME)
+
+
+def _build_patients(path: Path) -> Tuple[Dict[str, np.ndarray], Dict[str, object]]:
+    before = file_state(path.stat())
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    after = file_state(path.stat())
+    # Complete lines only: a registration may be appending right now
+    end = data.rfind(b'\n') + 1
+    data = data[:end] if end else data
+    df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+    field = lambda col: df[col].str.strip() if col in df.columns else pd.Series('', index=df.index)
+    keys = _utf8(field('first_name').str.lower() + KEY_SEPARATOR + field('last_name').str.lower()
+                 + KEY_SEPARATOR + field('dob'))
+    # Rows sorted by identity; stable, so the first record of a duplicate identity comes first
+    order = np.argsort(keys, kind='stable')
+    columns = {'key': keys[order]}
+    columns.update({col: _utf8(df[col])[order] for col in df.columns})
+    ids = df['patient_id'].str.extract(PATIENT_ID_PATTERN, expand=False).dropna() if 'patient_id' in df.columns else []
+    return columns, {
+        'source_bytes': len(data),
+        'fingerprint': _fingerprint(data),
+        'digest': hashlib.sha1(data).hexdigest(),
+        # The file state the snapshot is exactly a copy of, if the read saw a settled file
+        'source_state': after if before == after and after[0] == len(data) else None,
+        'header': list(df.columns),
+        'max_id': int(ids.astype(int).max()) if len(ids) else None,
+    }
+
+
+def patients_snapshot(path: Optional[Path] = None, max_tail_bytes: Optional[int] = None) -> Table:
+    """Memory-mapped patients.csv sorted on the normalized (first, last, dob) ``key`` column.
+
+    Every CSV column is stored as UTF-8 bytes in key order, so a lookup is a
+    binary search on ``key``. A version covers the first ``source_bytes`` of
+    the file and stays current while the file only grows past them, by at
+    most ``max_tail_bytes``; rows in that tail are left to the caller.
+
+    Growth recorded on the append chain (see appended_state) is trusted as
+    is; any other change re-checks the digest of every covered byte, so an
+    in-place edit forces a rebuild.
+    """
+    path = Path(path or io_utils.PATIENTS_CSV)
+    try:
+        state = file_state(path.stat())
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Missing patients.csv at {path}") from None
+    size = state[0]
+
+    def current(table: Table) -> bool:
+        covered = table.manifest.get('source_bytes')
+        if covered is None or covered > size or (max_tail_bytes is not None and size - covered > max_tail_bytes):
+            return False
+        if appended_state(table)[1] == state:
+            return True
+        if (covered_fingerprint(path, covered) != table.manifest.get('fingerprint')
+                or prefix_digest(path, covered) != table.manifest.get('digest')):
+            return False
+        # Verified in full: start a new chain from here
+        record_appended(table, uuid.uuid4().hex, state)
+        return True
+
+    return open_snapshot(path.parent / SNAPSHOT_DIRNAME / 'patients', current, lambda: _build_patients(path))
+
+
+def schedule_columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """The slot grid of a schedule frame as sorted columnar arrays.
+
+    Rows are ordered by (doctor, start minute); doctor, name, location and
+    slot type are codes into the ``doctor_ids``/``names``/``locations``/
+    ``slot_types`` vocabularies and times are minutes since the epoch. ``ids``
+    is ``doctor << 32 | start``, the sorted lookup key, and ``order`` maps each
+    row back to its position in ``df``.
+    """
+    start = minutes_array(df['date'], df['start_time'])
+    end = minutes_array(df['date'], df['end_time'])
+    doctor, doctor_ids = pd.factorize(df['doctor_id'].astype(str))
+    name, names = pd.factorize(df['doctor_name'].astype(str))
+    location, locations = pd.factorize(df['location'].astype(str))
+    slot_type, slot_types = pd.factorize(df['slot_type'].astype(str))
+    order = np.lexsort((start, doctor))
+    doctor = doctor[order].astype(np.int32)
+    start = start[order]
+    return {
+        'doctor': doctor,
+        'name': name[order].astype(np.int32),
+        'location': location[order].astype(np.int32),
+        'slot_type': slot_type[order].astype(np.int8),
+        'start': start,
+        'end': end[order],
+        'ids': (doctor.astype(np.int64) << 32) | start.astype(np.int64),
+        'order': order.astype(np.int64),
+        'doctor_ids': np.asarray(doctor_ids, dtype=str),
+        'names': np.asarray(names, dtype=str),
+        'locations': np.asarray(locations, dtype=str),
+        'slot_types': np.asarray(slot_types, dtype=str),
+    }
+
+
+def _build_schedule(source: str) -> Tuple[Dict[str, np.ndarray], Dict[str, object]]:
+    columns = schedule_columns(io_utils.load_schedule())
+    # Availability changes with every booking, so it is not part of the snapshot
+    del columns['order']
+    return columns, {'source': source}
+
+
+def schedule_snapshot() -> Table:
+    """Memory-mapped slot grid (see schedule_columns), rebuilt only when the set of slots changes."""
+    source = f'{io_utils.STORAGE_BACKEND}-{io_utils.grid_version()}'
+    return open_snapshot(io_utils.DATA_DIR / SNAPSHOT_DIRNAME / 'schedule',
+                         lambda table: table.manifest.get('source') == source, lambda: _build_schedule(source))
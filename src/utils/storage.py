@@ -0,0 +1,772 @@
+from __future__ import annotations
+import bisect
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .lazy import lazy_import
+from .records import from_minutes, to_minutes
+
+pd = lazy_import('pandas')
+
+SCHEDULE_COLUMNS = [
+    'doctor_id', 'doctor_name', 'location', 'date', 'start_time', 'end_time',
+    'slot_type', 'available', 'appointment_id', 'patient_id',
+]
+DOCTOR_COLUMNS = ['doctor_id', 'name', 'location']
+BOOKING_COLUMNS = ['doctor_id', 'date', 'start_time', 'appointment_id', 'patient_id']
+
+Reservation = Tuple[str, str, str, str, str]  # (doctor_id, date, start_time, appointment_id, patient_id)
+
+# Orders query_slots can page through; each is unique per slot, so it doubles as a keyset cursor
+SLOT_SORTS = {
+    'time': ('date', 'start_time', 'doctor_id'),
+    'doctor': ('doctor_id', 'date', 'start_time'),
+}
+# Dimensions slot_stats can group by
+STATS_KEYS = ('doctor_id', 'location', 'date')
+
+
+class StorageBusyError(RuntimeError):
+    """The store could not be locked for writing in time."""
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float = 30.0) -> Iterator[None]:
+    # Exclusive lock on a sidecar file, shared by threads and processes alike
+    lock_path = Path(path).with_name(Path(path).name + '.lock')
+    deadline = time.monotonic() + timeout
+    with open(lock_path, 'a+b') as fh:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise StorageBusyError(f"Timed out waiting for lock on {path}") from None
+                time.sleep(0.005)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _clean_schedule(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.reindex(columns=SCHEDULE_COLUMNS).copy()
+    for col in ['date', 'start_time', 'end_time']:
+        df[col] = df[col].astype(str)
+    df['available'] = df['available'].fillna(True).astype(bool)
+    df['appointment_id'] = df['appointment_id'].fillna('').astype(str)
+    df['patient_id'] = df['patient_id'].fillna('').astype(str)
+    return df
+
+
+def _midpoint(date: str, start_time: str, end_time: str) -> str:
+    start, end = to_minutes(date, start_time), to_minutes(date, end_time)
+    return from_minutes((start + end) // 2)[1]
+
+
+def split_new_rows(df: pd.DataFrame, since: str, until: str) -> Tuple[pd.DataFrame, int]:
+    """Split every free 'new' slot starting in [since, until) into two 'returning' halves.
+
+    ``since``/``until`` are 'YYYY-MM-DD HH:MM'. Returns the new frame (each
+    second half right after its first half) and the number of slots split.
+    """
+    starts = df['date'].astype(str) + ' ' + df['start_time'].astype(str)
+    mask = (df['available'].fillna(True).astype(bool) & (df['slot_type'] == 'new')
+            & (starts >= since) & (starts < until))
+    if not mask.any():
+        return df, 0
+    first = df[mask].copy()
+    mid = [_midpoint(d, s, e) for d, s, e in zip(first['date'], first['start_time'], first['end_time'])]
+    second = first.copy()
+    first['end_time'] = mid
+    second['start_time'] = mid
+    first['slot_type'] = second['slot_type'] = 'returning'
+    second.index = second.index + 0.5
+    out = pd.concat([df[~mask], first, second]).sort_index(kind='stable').reset_index(drop=True)
+    return out, int(mask.sum())
+
+
+@dataclass(frozen=True)
+class SlotFilter:
+    """Row filter for query_slots/slot_stats; None means no constraint.
+
+    Dates are inclusive 'YYYY-MM-DD'; ``booked`` selects booked (True) or
+    free (False) slots.
+    """
+    doctor_ids: Optional[Tuple[str, ...]] = None
+    locations: Optional[Tuple[str, ...]] = None
+    slot_types: Optional[Tuple[str, ...]] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    booked: Optional[bool] = None
+    patient_id: Optional[str] = None
+
+    @property
+    def per_day(self) -> bool:
+        # Whether the filter only constrains doctor, location and day (what slot_stats is keyed on)
+        return self.slot_types is None and self.booked is None and not self.patient_id
+
+    def mask(self, df: pd.DataFrame) -> pd.Series:
+        mask = pd.Series(True, index=df.index)
+        for col, values in (('doctor_id', self.doctor_ids), ('location', self.locations),
+                            ('slot_type', self.slot_types)):
+            if values is not None:
+                mask &= df[col].astype(str).isin(list(values))
+        if self.date_from:
+            mask &= df['date'].astype(str) >= self.date_from
+        if self.date_to:
+            mask &= df['date'].astype(str) <= self.date_to
+        if self.booked is not None:
+            mask &= ~df['available'].astype(bool) if self.booked else df['available'].astype(bool)
+        if self.patient_id:
+            mask &= df['patient_id'].astype(str) == self.patient_id
+        return mask
+
+    def sql(self) -> Tuple[List[str], List[Any]]:
+        # WHERE clauses (to be ANDed) and their parameters
+        clauses: List[str] = []
+        params: List[Any] = []
+        for col, values in (('doctor_id', self.doctor_ids), ('location', self.locations),
+                            ('slot_type', self.slot_types)):
+            if values is not None:
+                values = [str(v) for v in values]
+                clauses.append(f"{col} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if self.date_from:
+            clauses.append('date >= ?')
+            params.append(self.date_from)
+        if self.date_to:
+            clauses.append('date <= ?')
+            params.append(self.date_to)
+        if self.booked is not None:
+            # A literal, so the planner can use the partial index on booked slots
+            clauses.append(f"available = {0 if self.booked else 1}")
+        if self.patient_id:
+            clauses.append('patient_id = ?')
+            params.append(self.patient_id)
+        return clauses, params
+
+
+def _where(clauses: List[str]) -> str:
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+
+def _stats_keys(by: Sequence[str]) -> List[str]:
+    unknown = [k for k in by if k not in STATS_KEYS]
+    if unknown:
+        raise ValueError(f"Cannot group slot stats by {unknown}; expected some of {STATS_KEYS}")
+    return list(by)
+
+
+class ScheduleBackend:
+    """Live storage for the doctor schedule used by io_utils."""
+
+    def load_schedule(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def save_schedule(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def load_doctors(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def append_schedule(self, df: pd.DataFrame) -> None:
+        self.save_schedule(pd.concat([self.load_schedule(), df], ignore_index=True))
+
+    def reserve_slot(self, doctor_id: str, date: str, start_time: str,
+                     appointment_id: str, patient_id: str) -> bool:
+        # Atomically claim a free slot; False if someone else already holds it
+        raise NotImplementedError
+
+    def reserve_slots(self, reservations: List[Reservation]) -> List[bool]:
+        # Claim many slots at once; one flag per reservation, in order
+        return [self.reserve_slot(*r) for r in reservations]
+
+    def cancel_slot(self, appointment_id: str) -> Optional[Dict[str, str]]:
+        # Free the appointment's slot; returns its (doctor_id, date, start_time) or None if not booked
+        raise NotImplementedError
+
+    def move_slot(self, appointment_id: str, doctor_id: str, date: str, start_time: str) -> Optional[Dict[str, str]]:
+        # Claim the new slot and free the old one together; returns the old slot, or None if the
+        # new slot is taken (nothing changes). LookupError if the appointment is not booked.
+        raise NotImplementedError
+
+    def split_new_slots(self, since: str, until: str) -> int:
+        # Turn free 'new' slots starting in [since, until) into two 'returning' slots each
+        df, split = split_new_rows(self.load_schedule(), since, until)
+        if split:
+            self.save_schedule(df)
+        return split
+
+    def version(self) -> int:
+        # Changes whenever the schedule is written; used to invalidate caches
+        raise NotImplementedError
+
+    def last_write(self) -> Optional[Tuple[int, int]]:
+        # (version before, version after) of this thread's latest schedule write, if known
+        return None
+
+    def directory_version(self) -> int:
+        # Changes when doctors or the set of slots change, but not on bookings
+        return self.version()
+
+    def grid_version(self) -> str:
+        # Like directory_version, but also distinct across stores that were recreated
+        return str(self.directory_version())
+
+    def load_bookings(self) -> pd.DataFrame:
+        # Only the unavailable slots: doctor_id, date, start_time, appointment_id, patient_id
+        df = self.load_schedule()
+        return df.loc[~df['available'].fillna(True).astype(bool), BOOKING_COLUMNS].reset_index(drop=True)
+
+    def counts(self) -> Dict[str, int]:
+        # {'slots': total slots, 'booked': unavailable slots}
+        df = self.load_schedule()
+        return {'slots': len(df), 'booked': int((~df['available'].astype(bool)).sum())}
+
+    def query_slots(self, filters: SlotFilter, sort: str = 'time', descending: bool = False,
+                    after: Optional[Sequence[str]] = None, limit: int = 50) -> pd.DataFrame:
+        """Up to ``limit`` schedule rows matching ``filters``, in SLOT_SORTS[sort] order.
+
+        ``after`` is the sort key of the last row of the previous page (keyset
+        pagination): only rows strictly past it are returned.
+        """
+        cols = list(SLOT_SORTS[sort])
+        df = _clean_schedule(self.load_schedule())
+        df = df[filters.mask(df)].sort_values(cols, kind='stable')
+        keys = list(zip(*(df[c] for c in cols)))
+        if descending:
+            end = len(keys) if after is None else bisect.bisect_left(keys, tuple(after))
+            return df.iloc[max(end - limit, 0):end].iloc[::-1].reset_index(drop=True)
+        start = 0 if after is None else bisect.bisect_right(keys, tuple(after))
+        return df.iloc[start:start + limit].reset_index(drop=True)
+
+    def slot_stats(self, by: Sequence[str], filters: SlotFilter) -> pd.DataFrame:
+        # Total and booked slots per combination of ``by`` (STATS_KEYS), sorted by it
+        df = _clean_schedule(self.load_schedule())
+        by = _stats_keys(by)
+        df = df[filters.mask(df)].assign(slots=1, booked=lambda d: (~d['available']).astype(int))
+        if not by:
+            return pd.DataFrame({'slots': [len(df)], 'booked': [int(df['booked'].sum())]})
+        return df.groupby(by)[['slots', 'booked']].sum().reset_index()
+
+    def import_excel(self, path: Path) -> None:
+        schedule = pd.read_excel(path, sheet_name='schedule')
+        self.save_schedule(schedule)
+        try:
+            self.save_doctors(pd.read_excel(path, sheet_name='doctors'))
+        except ValueError:
+            pass
+
+    def export_excel(self, path: Path) -> None:
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            self.load_schedule().to_excel(writer, sheet_name='schedule', index=False)
+            doctors = self.load_doctors()
+            if not doctors.empty:
+                doctors.to_excel(writer, sheet_name='doctors', index=False)
+
+    def save_doctors(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+
+class ExcelBackend(ScheduleBackend):
+    """The original workbook store: every write rewrites the whole file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _require(self) -> None:
+        if not self.path.exists():
+            raise FileNotFoundError(f"Missing doctor_schedule.xlsx at {self.path}")
+
+    def load_schedule(self) -> pd.DataFrame:
+        self._require()
+        return pd.read_excel(self.path, sheet_name='schedule', engine='openpyxl')
+
+    def _read_doctors(self) -> Optional[pd.DataFrame]:
+        # None only when the workbook has no doctors sheet; unreadable workbooks raise
+        with pd.ExcelFile(self.path, engine='openpyxl') as book:
+            if 'doctors' not in book.sheet_names:
+                return None
+            return book.parse('doctors')
+
+    def load_doctors(self) -> pd.DataFrame:
+        self._require()
+        doctors = self._read_doctors()
+        return pd.DataFrame(columns=DOCTOR_COLUMNS) if doctors is None else doctors
+
+    def _write(self, schedule: pd.DataFrame, doctors: Optional[pd.DataFrame]) -> None:
+        # Write a sibling file and swap it in, so readers (who take no lock) never see a partial workbook
+        tmp = self.path.with_name(f'.{self.path.stem}.{uuid.uuid4().hex[:8]}.tmp{self.path.suffix}')
+        try:
+            with pd.ExcelWriter(tmp, engine='openpyxl') as writer:
+                schedule.to_excel(writer, sheet_name='schedule', index=False)
+                if doctors is not None:
+                    doctors.to_excel(writer, sheet_name='doctors', index=False)
+            before = self.path.stat().st_mtime_ns if self.path.exists() else None
+            os.replace(tmp, self.path)
+            self._local.last_write = None if before is None else (before, self.path.stat().st_mtime_ns)
+        except PermissionError as e:
+            # Typically the workbook is open in Excel
+            raise StorageBusyError(f"Cannot write {self.path}: {e}") from e
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _save_schedule(self, df: pd.DataFrame) -> None:
+        # Preserve doctors sheet if present
+        self._write(df, self._read_doctors() if self.path.exists() else None)
+
+    def save_schedule(self, df: pd.DataFrame) -> None:
+        with file_lock(self.path):
+            self._save_schedule(df)
+
+    def save_doctors(self, df: pd.DataFrame) -> None:
+        with file_lock(self.path):
+            self._write(self.load_schedule(), df)
+
+    def reserve_slot(self, doctor_id: str, date: str, start_time: str,
+                     appointment_id: str, patient_id: str) -> bool:
+        with file_lock(self.path):
+            full = self.load_schedule()
+            mask = (full['doctor_id'] == doctor_id) & (full['date'] == date) & (full['start_time'] == start_time)
+            if not full.loc[mask, 'available'].astype(bool).any():
+                return False
+            full.loc[mask, 'available'] = False
+            full.loc[mask, 'appointment_id'] = appointment_id
+            full.loc[mask, 'patient_id'] = patient_id
+            self._save_schedule(full)
+            return True
+
+    def reserve_slots(self, reservations: List[Reservation]) -> List[bool]:
+        # One read and one rewrite of the workbook for the whole batch
+        with file_lock(self.path):
+            full = self.load_schedule()
+            index = {(str(d), str(dt), str(t)): i for i, (d, dt, t) in
+                     enumerate(zip(full['doctor_id'], full['date'], full['start_time']))}
+            available = full['available'].astype(bool).tolist()
+            claimed = []
+            for doctor_id, date, start_time, appointment_id, patient_id in reservations:
+                i = index.get((str(doctor_id), str(date), str(start_time)))
+                ok = i is not None and available[i]
+                if ok:
+                    available[i] = False
+                    full.loc[full.index[i], ['appointment_id', 'patient_id']] = [appointment_id, patient_id]
+                claimed.append(ok)
+            if any(claimed):
+                full['available'] = available
+                self._save_schedule(full)
+            return claimed
+
+    def _booked_row(self, full: pd.DataFrame, appointment_id: str) -> Optional[int]:
+        rows = full.index[(full['appointment_id'].astype(str) == appointment_id) & ~full['available'].astype(bool)]
+        return rows[0] if len(rows) else None
+
+    def cancel_slot(self, appointment_id: str) -> Optional[Dict[str, str]]:
+        with file_lock(self.path):
+            full = self.load_schedule()
+            row = self._booked_row(full, appointment_id)
+            if row is None:
+                return None
+            old = {k: str(full.at[row, k]) for k in ('doctor_id', 'date', 'start_time')}
+            full.loc[row, ['available', 'appointment_id', 'patient_id']] = [True, '', '']
+            self._save_schedule(full)
+            return old
+
+    def move_slot(self, appointment_id: str, doctor_id: str, date: str, start_time: str) -> Optional[Dict[str, str]]:
+        with file_lock(self.path):
+            full = self.load_schedule()
+            row = self._booked_row(full, appointment_id)
+            target = full.index[(full['doctor_id'] == doctor_id) & (full['date'].astype(str) == str(date))
+                                & (full['start_time'].astype(str) == str(start_time)) & full['available'].astype(bool)]
+            if row is None:
+                raise LookupError(f"Appointment {appointment_id} is not booked")
+            if not len(target):
+                return None
+            old = {k: str(full.at[row, k]) for k in ('doctor_id', 'date', 'start_time')}
+            full.loc[target[0], ['available', 'appointment_id', 'patient_id']] = [False, appointment_id, full.at[row, 'patient_id']]
+            full.loc[row, ['available', 'appointment_id', 'patient_id']] = [True, '', '']
+            self._save_schedule(full)
+            return old
+
+    def split_new_slots(self, since: str, until: str) -> int:
+        with file_lock(self.path):
+            df, split = split_new_rows(self.load_schedule(), since, until)
+            if split:
+                self._save_schedule(df)
+            return split
+
+    def version(self) -> int:
+        self._require()
+        return self.path.stat().st_mtime_ns
+
+    def last_write(self) -> Optional[Tuple[int, int]]:
+        # Writers hold the file lock, so nothing lands between the two stats
+        return getattr(self._local, 'last_write', None)
+
+    def import_excel(self, path: Path) -> None:
+        if Path(path).resolve() != self.path.resolve():
+            super().import_excel(path)
+
+    def export_excel(self, path: Path) -> None:
+        if Path(path).resolve() != self.path.resolve():
+            super().export_excel(path)
+
+
+class SQLiteBackend(ScheduleBackend):
+    """SQLite (WAL) store where a booking is a single-row update.
+
+    When the database is empty it is seeded once from ``seed_xlsx``; the
+    workbook is otherwise only used through import_excel/export_excel.
+    """
+
+    def __init__(self, path: Path, seed_xlsx: Optional[Path] = None):
+        self.path = Path(path)
+        self.seed_xlsx = Path(seed_xlsx) if seed_xlsx else None
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        if not self._initialized:
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS slots (
+                    doctor_id TEXT NOT NULL,
+                    doctor_name TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    end_time TEXT NOT NULL,
+                    slot_type TEXT NOT NULL,
+                    available INTEGER NOT NULL DEFAULT 1,
+                    appointment_id TEXT NOT NULL DEFAULT '',
+                    patient_id TEXT NOT NULL DEFAULT ''
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS slots_doctor_date_time
+                    ON slots (doctor_id, date, start_time);
+                CREATE INDEX IF NOT EXISTS slots_appointment
+                    ON slots (appointment_id) WHERE appointment_id != '';
+                CREATE INDEX IF NOT EXISTS slots_date_time
+                    ON slots (date, start_time, doctor_id);
+                CREATE INDEX IF NOT EXISTS slots_booked_date_time
+                    ON slots (date, start_time, doctor_id) WHERE available = 0;
+                CREATE TABLE IF NOT EXISTS doctors (
+                    doctor_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    location TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('directory_version', 0);
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', abs(random()));
+                INSERT OR IGNORE INTO meta (key, value) SELECT 'slots', COUNT(*) FROM slots;
+                INSERT OR IGNORE INTO meta (key, value) SELECT 'booked', COUNT(*) FROM slots WHERE available = 0;
+
+                -- Slots and booked slots per doctor, location and day. Bookings keep it
+                -- current through the trigger; writes that add or remove slots update it
+                -- themselves (see _add_stats), which is much cheaper than a per-row trigger.
+                CREATE TABLE IF NOT EXISTS slot_stats (
+                    doctor_id TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    slots INTEGER NOT NULL,
+                    booked INTEGER NOT NULL,
+                    PRIMARY KEY (doctor_id, location, date)
+                ) WITHOUT ROWID;
+                CREATE TRIGGER IF NOT EXISTS slot_stats_available AFTER UPDATE OF available ON slots
+                WHEN NEW.available != OLD.available
+                BEGIN
+                    UPDATE slot_stats SET booked = booked + OLD.available - NEW.available
+                    WHERE doctor_id = NEW.doctor_id AND location = NEW.location AND date = NEW.date;
+                END;
+                -- Databases from before slot_stats existed
+                INSERT OR IGNORE INTO slot_stats (doctor_id, location, date, slots, booked)
+                    SELECT doctor_id, location, date, COUNT(*), SUM(available = 0) FROM slots
+                    WHERE NOT EXISTS (SELECT 1 FROM slot_stats)
+                    GROUP BY doctor_id, location, date;
+            """)
+            empty = conn.execute('SELECT NOT EXISTS (SELECT 1 FROM slots)').fetchone()[0]
+            self._initialized = True
+            if empty and self.seed_xlsx is not None and self.seed_xlsx.exists():
+                self.import_excel(self.seed_xlsx)
+
+    def _add_stats(self, conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, str, int, int]]) -> None:
+        # Add (doctor_id, location, date, slots, booked) deltas to slot_stats
+        conn.executemany(
+            "INSERT INTO slot_stats (doctor_id, location, date, slots, booked) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (doctor_id, location, date) DO UPDATE "
+            "SET slots = slots + excluded.slots, booked = booked + excluded.booked", rows)
+
+    def _bump_version(self, conn: sqlite3.Connection, directory: bool = False) -> None:
+        keys = ('version', 'directory_version') if directory else ('version',)
+        conn.executemany("UPDATE meta SET value = value + 1 WHERE key = ?", [(k,) for k in keys])
+        # Inside the write transaction, so the previous version is exactly one less
+        version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        self._local.last_write = (version - 1, version)
+
+    def load_schedule(self) -> pd.DataFrame:
+        conn = self._connect()
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM slots ORDER BY rowid", conn)
+        if df.empty and not (self.seed_xlsx and self.seed_xlsx.exists()):
+            raise FileNotFoundError(f"Missing doctor_schedule.xlsx at {self.seed_xlsx}")
+        df['available'] = df['available'].astype(bool)
+        return df
+
+    def save_schedule(self, df: pd.DataFrame) -> None:
+        self._write_slots(df, replace=True)
+
+    def append_schedule(self, df: pd.DataFrame) -> None:
+        # Bulk loads (e.g. data_gen) stream chunks through here without re-reading the table
+        self._write_slots(df, replace=False)
+
+    def _write_slots(self, df: pd.DataFrame, replace: bool) -> None:
+        df = _clean_schedule(df)
+        df['available'] = df['available'].astype(int)
+        booked = int((df['available'] == 0).sum())
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if replace:
+                conn.execute('DELETE FROM slots')
+                conn.execute('DELETE FROM slot_stats')
+                conn.execute("UPDATE meta SET value = 0 WHERE key IN ('slots', 'booked')")
+            conn.executemany(
+                f"INSERT INTO slots ({', '.join(SCHEDULE_COLUMNS)}) VALUES ({', '.join('?' * len(SCHEDULE_COLUMNS))})",
+                df.itertuples(index=False, name=None))
+            stats = (df.assign(booked=df['available'] == 0)
+                     .groupby(['doctor_id', 'location', 'date'], sort=False)['booked'].agg(['size', 'sum']))
+            self._add_stats(conn, [(*key, int(n), int(b)) for key, n, b in
+                                   zip(stats.index, stats['size'], stats['sum'])])
+            conn.execute("UPDATE meta SET value = value + ? WHERE key = 'slots'", (len(df),))
+            conn.execute("UPDATE meta SET value = value + ? WHERE key = 'booked'", (booked,))
+            self._bump_version(conn, directory=True)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def load_doctors(self) -> pd.DataFrame:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(DOCTOR_COLUMNS)} FROM doctors ORDER BY rowid", self._connect())
+
+    def save_doctors(self, df: pd.DataFrame) -> None:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM doctors')
+            conn.executemany(
+                'INSERT INTO doctors (doctor_id, name, location) VALUES (?, ?, ?)',
+                df.reindex(columns=DOCTOR_COLUMNS).astype(str).itertuples(index=False, name=None))
+            self._bump_version(conn, directory=True)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def reserve_slot(self, doctor_id: str, date: str, start_time: str,
+                     appointment_id: str, patient_id: str) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            raise StorageBusyError(f"Cannot lock {self.path}: {e}") from e
+        try:
+            # Compare-and-set on availability: only one caller can flip the row
+            claimed = conn.execute(
+                'UPDATE slots SET available = 0, appointment_id = ?, patient_id = ? '
+                'WHERE doctor_id = ? AND date = ? AND start_time = ? AND available = 1',
+                (appointment_id, patient_id, doctor_id, str(date), str(start_time))).rowcount == 1
+            if claimed:
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'booked'")
+                self._bump_version(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return claimed
+
+    def reserve_slots(self, reservations: List[Reservation]) -> List[bool]:
+        # Same compare-and-set per slot, but all in one write transaction
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            raise StorageBusyError(f"Cannot lock {self.path}: {e}") from e
+        try:
+            claimed = [
+                conn.execute(
+                    'UPDATE slots SET available = 0, appointment_id = ?, patient_id = ? '
+                    'WHERE doctor_id = ? AND date = ? AND start_time = ? AND available = 1',
+                    (appointment_id, patient_id, doctor_id, str(date), str(start_time))).rowcount == 1
+                for doctor_id, date, start_time, appointment_id, patient_id in reservations
+            ]
+            if any(claimed):
+                conn.execute("UPDATE meta SET value = value + ? WHERE key = 'booked'", (sum(claimed),))
+                self._bump_version(conn)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return claimed
+
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            raise StorageBusyError(f"Cannot lock {self.path}: {e}") from e
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _booked(self, conn: sqlite3.Connection, appointment_id: str) -> Optional[tuple]:
+        return conn.execute(
+            "SELECT rowid, doctor_id, date, start_time, patient_id FROM slots "
+            "WHERE appointment_id = ? AND appointment_id != '' AND available = 0", (appointment_id,)).fetchone()
+
+    def _free(self, conn: sqlite3.Connection, rowid: int) -> None:
+        conn.execute("UPDATE slots SET available = 1, appointment_id = '', patient_id = '' WHERE rowid = ?", (rowid,))
+
+    def cancel_slot(self, appointment_id: str) -> Optional[Dict[str, str]]:
+        with self._write_transaction() as conn:
+            row = self._booked(conn, appointment_id)
+            if row is None:
+                return None
+            self._free(conn, row[0])
+            conn.execute("UPDATE meta SET value = value - 1 WHERE key = 'booked'")
+            self._bump_version(conn)
+        return {'doctor_id': row[1], 'date': row[2], 'start_time': row[3]}
+
+    def move_slot(self, appointment_id: str, doctor_id: str, date: str, start_time: str) -> Optional[Dict[str, str]]:
+        with self._write_transaction() as conn:
+            row = self._booked(conn, appointment_id)
+            if row is None:
+                raise LookupError(f"Appointment {appointment_id} is not booked")
+            # Claim the new slot first; if that loses, nothing has changed
+            claimed = conn.execute(
+                'UPDATE slots SET available = 0, appointment_id = ?, patient_id = ? '
+                'WHERE doctor_id = ? AND date = ? AND start_time = ? AND available = 1',
+                (appointment_id, row[4], doctor_id, str(date), str(start_time))).rowcount == 1
+            if not claimed:
+                return None
+            self._free(conn, row[0])
+            self._bump_version(conn)
+        return {'doctor_id': row[1], 'date': row[2], 'start_time': row[3]}
+
+    def split_new_slots(self, since: str, until: str) -> int:
+        with self._write_transaction() as conn:
+            rows = conn.execute(
+                "SELECT rowid, doctor_id, doctor_name, location, date, start_time, end_time FROM slots "
+                "WHERE available = 1 AND slot_type = 'new' AND date || ' ' || start_time >= ? "
+                "AND date || ' ' || start_time < ?", (since, until)).fetchall()
+            if not rows:
+                return 0
+            halves = [(r, _midpoint(r[4], r[5], r[6])) for r in rows]
+            conn.executemany("UPDATE slots SET slot_type = 'returning', end_time = ? WHERE rowid = ?",
+                             [(mid, r[0]) for r, mid in halves])
+            conn.executemany(
+                "INSERT INTO slots (doctor_id, doctor_name, location, date, start_time, end_time, slot_type) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'returning')",
+                [(r[1], r[2], r[3], r[4], mid, r[6]) for r, mid in halves])
+            self._add_stats(conn, [(*key, n, 0) for key, n in Counter((r[1], r[3], r[4]) for r in rows).items()])
+            conn.execute("UPDATE meta SET value = value + ? WHERE key = 'slots'", (len(rows),))
+            self._bump_version(conn, directory=True)
+        return len(rows)
+
+    def version(self) -> int:
+        return self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def directory_version(self) -> int:
+        return self._connect().execute("SELECT value FROM meta WHERE key = 'directory_version'").fetchone()[0]
+
+    def last_write(self) -> Optional[Tuple[int, int]]:
+        return getattr(self._local, 'last_write', None)
+
+    def grid_version(self) -> str:
+        rows = dict(self._connect().execute(
+            "SELECT key, value FROM meta WHERE key IN ('generation', 'directory_version')").fetchall())
+        return f"{rows['generation']}-{rows['directory_version']}"
+
+    def load_bookings(self) -> pd.DataFrame:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(BOOKING_COLUMNS)} FROM slots WHERE available = 0 ORDER BY rowid", self._connect())
+
+    def counts(self) -> Dict[str, int]:
+        # Maintained incrementally by writes, so this never scans the slots table
+        rows = self._connect().execute("SELECT key, value FROM meta WHERE key IN ('slots', 'booked')").fetchall()
+        return dict(rows)
+
+    def query_slots(self, filters: SlotFilter, sort: str = 'time', descending: bool = False,
+                    after: Optional[Sequence[str]] = None, limit: int = 50) -> pd.DataFrame:
+        # Filtered, ordered and cut to one page in SQL; the sort key walks an index
+        cols = SLOT_SORTS[sort]
+        clauses, params = filters.sql()
+        if after is not None:
+            clauses.append(f"({', '.join(cols)}) {'<' if descending else '>'} ({', '.join('?' * len(cols))})")
+            params.extend(str(v) for v in after)
+        order = ', '.join(f"{c} {'DESC' if descending else 'ASC'}" for c in cols)
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM slots {_where(clauses)} ORDER BY {order} LIMIT ?",
+            self._connect(), params=params + [int(limit)])
+        df['available'] = df['available'].astype(bool)
+        return df
+
+    def slot_stats(self, by: Sequence[str], filters: SlotFilter) -> pd.DataFrame:
+        # From the per-day aggregates when the filter allows it, else aggregated over the slots
+        by = _stats_keys(by)
+        clauses, params = filters.sql()
+        if filters.per_day:
+            source, slots, booked = 'slot_stats', 'SUM(slots)', 'SUM(booked)'
+        else:
+            source, slots, booked = 'slots', 'COUNT(*)', 'SUM(available = 0)'
+        keys = ', '.join(by)
+        group = f"GROUP BY {keys} ORDER BY {keys}" if by else ''
+        df = pd.read_sql_query(
+            f"SELECT {keys + ', ' if by else ''}{slots} AS slots, COALESCE({booked}, 0) AS booked "
+            f"FROM {source} {_where(clauses)} {group}", self._connect(), params=params)
+        df['slots'] = df['slots'].fillna(0).astype(int)
+        return df
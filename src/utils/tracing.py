@@ -0,0 +1,191 @@
+from __future__ import annotations
+import bisect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open-ended
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+MAX_TRACES = 256
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:12]
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            'trace_id': self.trace_id,
+            'spans': spans,
+            'node_ms': round(sum(s['wall_ms'] for s in spans if s['kind'] == 'node'), 3),
+            'io_ms': round(sum(s['wall_ms'] for s in spans if s['kind'] == 'io'), 3),
+        }
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+    def observe(self, wall_ms: float, rows: int, nbytes: Optional[int]) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, wall_ms)] += 1
+        self.total += 1
+        self.sum_ms += wall_ms
+        self.max_ms = max(self.max_ms, wall_ms)
+        self.rows += rows
+        self.bytes += nbytes or 0
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        target = q * self.total
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target and n:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return 0.0
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar('trace', default=None)
+_traces: 'OrderedDict[str, Trace]' = OrderedDict()
+_histograms: Dict[str, Histogram] = {}
+_lock = threading.Lock()
+
+
+def _get_or_create(trace_id: Optional[str]) -> Trace:
+    with _lock:
+        trace = _traces.get(trace_id) if trace_id else None
+        if trace is None:
+            trace = Trace(trace_id)
+            _traces[trace.trace_id] = trace
+            while len(_traces) > MAX_TRACES:
+                _traces.popitem(last=False)
+        return trace
+
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    with _lock:
+        return _traces.get(trace_id)
+
+
+def record(name: str, kind: str, wall_ns: int, rows_read: int = 0, rows_written: int = 0,
+           bytes_read: Optional[int] = None, bytes_written: Optional[int] = None) -> None:
+    # Bytes are None when the call does not know them (e.g. SQLite queries), rather than 0
+    wall_ms = wall_ns / 1e6
+    nbytes = None if bytes_read is None and bytes_written is None else (bytes_read or 0) + (bytes_written or 0)
+    with _lock:
+        _histograms.setdefault(name, Histogram()).observe(wall_ms, rows_read + rows_written, nbytes)
+    trace = _current.get()
+    if trace is not None:
+        trace.add({
+            'name': name, 'kind': kind, 'wall_ms': round(wall_ms, 3),
+            'rows_read': rows_read, 'rows_written': rows_written,
+            'bytes_read': bytes_read, 'bytes_written': bytes_written,
+        })
+
+
+def _rows(value: Any, counts: bool = False) -> int:
+    # ``counts``: an int result is a row count (e.g. rows compacted), not some other number
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value if counts else 0
+    if hasattr(value, '__len__') and not isinstance(value, (str, bytes, dict)):
+        return len(value)
+    return 0
+
+
+def traced_io(kind: str, path: Optional[Callable[[], Optional[Path]]] = None,
+              nbytes: Optional[Callable[..., int]] = None):
+    """Record wall time, rows and bytes moved for an io_utils function.
+
+    ``kind`` is 'read' (rows counted from the result) or 'write' (rows from
+    the first argument, or the result when there is none). ``path`` returns
+    the file the call reads or rewrites in full, if any, so its size is the
+    bytes moved; ``nbytes`` computes them from the call's arguments instead
+    (e.g. an append). Calls with neither record no byte count.
+    """
+    def decorator(fn: Callable) -> Callable:
+        name = f"io.{fn.__name__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            result = fn(*args, **kwargs)
+            wall_ns = time.perf_counter_ns() - start
+            file = path() if path else None
+            if file is not None:
+                moved = file.stat().st_size if file.exists() else 0
+            else:
+                moved = nbytes(*args, **kwargs) if nbytes else None
+            if kind == 'read':
+                record(name, 'io', wall_ns, rows_read=_rows(result), bytes_read=moved)
+            else:
+                rows = _rows(args[0]) if args and not isinstance(args[0], (str, Path)) else _rows(result, counts=True)
+                record(name, 'io', wall_ns, rows_written=rows, bytes_written=moved)
+            return result
+        return wrapper
+    return decorator
+
+
+def traced_node(name: str, fn: Callable[[Dict[str, Any]], Dict[str, Any]],
+                new_trace: bool = False) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Wrap a graph node so it and the I/O it performs are recorded under the state's trace.
+
+    The entry node passes ``new_trace=True`` so every graph invocation is one request.
+    """
+    @wraps(fn)
+    def wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+        trace = _get_or_create(None if new_trace else state.get('trace_id'))
+        token = _current.set(trace)
+        start = time.perf_counter_ns()
+        try:
+            result = fn(state)
+        finally:
+            record(f"node.{name}", 'node', time.perf_counter_ns() - start)
+            _current.reset(token)
+        result['trace_id'] = trace.trace_id
+        result['trace'] = trace.to_dict()
+        return result
+    return wrapper
+
+
+def histograms() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {
+            name: {
+                'count': h.total,
+                'mean_ms': round(h.sum_ms / h.total, 3) if h.total else 0.0,
+                'p50_ms': h.quantile(0.5),
+                'p95_ms': h.quantile(0.95),
+                'p99_ms': h.quantile(0.99),
+                'max_ms': round(h.max_ms, 3),
+                'rows': h.rows,
+                'bytes': h.bytes,
+                'buckets': dict(zip([str(b) for b in BUCKETS_MS] + ['inf'], h.counts)),
+            }
+            for name, h in sorted(_histograms.items())
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+        _traces.clear()